@@ -3,22 +3,38 @@ Wikimedia Commons API Module
 
 Provides functions to interact with MediaWiki and Wikidata APIs:
 - fetch_category_files: Get all files from a Commons category
+- fetch_category_revisions: Same, with each file's current page revision
 - check_depicts: Check if a file has P180 depicts statements
 - resolve_labels: Convert QIDs to human-readable labels
 
 Enhanced with:
-- Retry logic with exponential backoff
-- Rate limiting to avoid API throttling
+- Connection-level retries with exponential backoff (urllib3 Retry)
+- Token-bucket rate limiting to avoid API throttling
 - Better error messages
+- Pooled keep-alive HTTP session
 """
 
+import json
+import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
-import functools
 import threading
 from collections import OrderedDict
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple, Dict, Optional, Any
 
+from database import get_cached_labels, cache_labels, normalize_category
+
+# orjson parses large API payloads several times faster; fall back to stdlib
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 # API Endpoints
 COMMONS_API = "https://commons.wikimedia.org/w/api.php"
 WIKIDATA_API = "https://www.wikidata.org/w/api.php"
@@ -28,71 +44,133 @@ HEADERS = {
     "User-Agent": "CommonsDepictsAnalyzer/1.0 (Educational workshop project; Contact: aravindlalwork@gmail.com)"
 }
 
+# Connection pool sizing. Worker threads calling into this module share the
+# pool, so HTTP_POOL_MAXSIZE must stay above the largest thread pool used by
+# callers; otherwise surplus connections are opened and thrown away per call.
+HTTP_POOL_CONNECTIONS = 4  # distinct hosts kept warm (commons, wikidata, ...)
+HTTP_POOL_MAXSIZE = 32     # concurrent keep-alive sockets per host
+
+# Connect timeout (seconds) paired with each call's read timeout: a host that
+# never answers the handshake fails fast and is retried, instead of using up
+# the whole read budget on every attempt.
+HTTP_CONNECT_TIMEOUT = 3.05
+
+# Retries happen at the connection level inside urllib3: connection resets,
+# read timeouts and 429/5xx responses are retried with exponential backoff,
+# and throttling responses wait for the server's Retry-After header.
+HTTP_RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["GET"],
+    respect_retry_after_header=True,
+    raise_on_status=False,  # let raise_for_status() surface the final HTTPError
+)
+
+# Shared HTTP session: keeps TCP/TLS connections to Commons and Wikidata alive
+# across calls instead of re-handshaking on every request.
+_SESSION = requests.Session()
+_SESSION.headers.update(HEADERS)
+_adapter = HTTPAdapter(
+    pool_connections=HTTP_POOL_CONNECTIONS,
+    pool_maxsize=HTTP_POOL_MAXSIZE,
+    max_retries=HTTP_RETRY,
+)
+_SESSION.mount("https://", _adapter)
+_SESSION.mount("http://", _adapter)
+
 # Simple in-memory cache for QID labels with TTL + LRU eviction
 _LABEL_CACHE_TTL = 3600  # seconds
-_LABEL_CACHE_MAX = 5000
-_label_cache: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_LABEL_CACHE_MAX = 50_000  # entries; ~a few MB at typical label lengths
+_label_cache: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
 _label_cache_lock = threading.Lock()
+_LABEL_CACHE_SWEEP_INTERVAL = 60  # seconds between expiry sweeps
+_last_evict = 0.0  # time.monotonic() of the last sweep
+
+# Typeahead results per (prefix, limit); prefixsearch output is stable for minutes
+_SUGGEST_CACHE_TTL = 300  # seconds
+_SUGGEST_CACHE_MAX = 2048  # entries
+_suggest_cache: "OrderedDict[Tuple[str, int], Tuple[Tuple[str, ...], float]]" = OrderedDict()
+_suggest_cache_lock = threading.Lock()
+
+# Max concurrent wbgetentities batches when resolving many labels at once
+_LABEL_FETCH_WORKERS = 8
+
+# Filename clean-up patterns used by suggest_depicts
+_EXT_RE = re.compile(r'\.[a-zA-Z0-9]+$')
+_YEAR_RE = re.compile(r'\b\d{4,}\b')
+_CAMERA_ID_RE = re.compile(r'\b[A-Z]{2,5}\s*\d+\b')
+_NOISE_RE = re.compile(r'\bIMG\b|\bDSC\b|\bP\d+\b|\bIMGP\b', re.IGNORECASE)
+_STOPWORDS = frozenset({
+    'the', 'and', 'for', 'from', 'with', 'this', 'that', 'are', 'was',
+    'has', 'have', 'been', 'not', 'but', 'its', 'his', 'her', 'their',
+    'our', 'can', 'will', 'may', 'jpg', 'jpeg', 'png', 'svg', 'tif',
+    'tiff', 'gif', 'file', 'image', 'photo', 'picture', 'crop', 'edit',
+    'version', 'original', 'commons', 'wiki', 'wikipedia'
+})
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
 
-# Rate limiting disabled - let API handle its own throttling
-# Set to 0 for real-time speed, increase if you get rate limited
-RATE_LIMIT_DELAY = 0.0  # No delay between requests
-_last_request_time = 0.0
+    Allows bursts of up to `capacity` requests, refilled at `rate` tokens per
+    second. A non-positive rate disables limiting entirely.
+    """
 
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until one is available."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
-def _rate_limit():
-    """Enforce rate limiting between API calls (disabled by default)."""
-    global _last_request_time
-    if RATE_LIMIT_DELAY > 0:
-        current_time = time.time()
-        elapsed = current_time - _last_request_time
-        if elapsed < RATE_LIMIT_DELAY:
-            time.sleep(RATE_LIMIT_DELAY - elapsed)
-        _last_request_time = time.time()
 
+# Rate limiting disabled - let API handle its own throttling
+# Set RATE_LIMIT_PER_SECOND > 0 if you get rate limited
+RATE_LIMIT_PER_SECOND = 0.0  # Sustained requests per second (0 = unlimited)
+RATE_LIMIT_BURST = 10        # Requests allowed back-to-back before throttling
+_BUCKET = TokenBucket(RATE_LIMIT_BURST, RATE_LIMIT_PER_SECOND)
 
-def retry_on_failure(max_retries: int = 3, base_delay: float = 1.0):
-    """
-    Decorator to retry failed API calls with exponential backoff.
 
-    Args:
-        max_retries: Maximum number of retry attempts
-        base_delay: Initial delay in seconds (doubles each retry)
-    """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(max_retries + 1):
-                try:
-                    return func(*args, **kwargs)
-                except requests.exceptions.RequestException as e:
-                    last_exception = e
-                    if attempt < max_retries:
-                        delay = base_delay * (2 ** attempt)
-                        print(f"  [RETRY] Attempt {attempt + 1} failed, retrying in {delay}s...")
-                        time.sleep(delay)
-            raise last_exception
-        return wrapper
-    return decorator
-
-
-def _cache_get(cache_key: str) -> Optional[str]:
-    now = time.time()
+def _evict_expired(now: float) -> None:
+    """Sweep expired label cache entries, at most once per _LABEL_CACHE_SWEEP_INTERVAL."""
+    global _last_evict
+    if now - _last_evict < _LABEL_CACHE_SWEEP_INTERVAL:
+        return
+    with _label_cache_lock:
+        _last_evict = now
+        expired = [key for key, (_, ts) in _label_cache.items() if now - ts > _LABEL_CACHE_TTL]
+        for key in expired:
+            del _label_cache[key]
+
+
+def _cache_get(cache_key: Tuple[str, str]) -> Optional[str]:
+    # TTL is enforced by the periodic _evict_expired sweep, not per lookup
     with _label_cache_lock:
         entry = _label_cache.get(cache_key)
         if not entry:
             return None
-        value, timestamp = entry
-        if now - timestamp > _LABEL_CACHE_TTL:
-            _label_cache.pop(cache_key, None)
-            return None
         _label_cache.move_to_end(cache_key)
-        return value
+        return entry[0]
 
 
-def _cache_set(cache_key: str, value: str) -> None:
-    now = time.time()
+def _cache_set(cache_key: Tuple[str, str], value: str, now: float) -> None:
     with _label_cache_lock:
         _label_cache[cache_key] = (value, now)
         _label_cache.move_to_end(cache_key)
@@ -100,6 +178,13 @@ def _cache_set(cache_key: str, value: str) -> None:
             _label_cache.popitem(last=False)
 
 
+def _fetch_entities(api_url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a single wbgetentities request and return its 'entities' map."""
+    response = _SESSION.get(api_url, params=params, timeout=(HTTP_CONNECT_TIMEOUT, 30))
+    response.raise_for_status()
+    return _json_loads(response.content).get("entities", {})
+
+
 def validate_category_exists(category_name: str) -> Tuple[bool, Optional[str]]:
     """
     Check if a category exists on Wikimedia Commons.
@@ -110,7 +195,7 @@ def validate_category_exists(category_name: str) -> Tuple[bool, Optional[str]]:
     Returns:
         Tuple of (exists: bool, error_message: Optional[str])
     """
-    _rate_limit()
+    _BUCKET.acquire()
     params = {
         "action": "query",
         "titles": category_name,
@@ -118,9 +203,9 @@ def validate_category_exists(category_name: str) -> Tuple[bool, Optional[str]]:
     }
 
     try:
-        response = requests.get(COMMONS_API, params=params, headers=HEADERS, timeout=30)
+        response = _SESSION.get(COMMONS_API, params=params, timeout=(HTTP_CONNECT_TIMEOUT, 30))
         response.raise_for_status()
-        data = response.json()
+        data = _json_loads(response.content)
 
         pages = data.get("query", {}).get("pages", {})
         if not pages:
@@ -135,7 +220,6 @@ def validate_category_exists(category_name: str) -> Tuple[bool, Optional[str]]:
         return (False, f"Network error checking category: {str(e)}")
 
 
-@retry_on_failure(max_retries=2, base_delay=0.5)
 def fetch_category_suggestions(query: str, limit: int = 8) -> List[str]:
     """
     Fetch category name suggestions from Wikimedia Commons.
@@ -150,33 +234,42 @@ def fetch_category_suggestions(query: str, limit: int = 8) -> List[str]:
     if not query or len(query.strip()) < 2:
         return []
 
-    _rate_limit()
+    query = query.strip()
+    cache_key = (query, limit)
+    now = time.monotonic()
+    with _suggest_cache_lock:
+        entry = _suggest_cache.get(cache_key)
+        if entry and now - entry[1] <= _SUGGEST_CACHE_TTL:
+            _suggest_cache.move_to_end(cache_key)
+            return list(entry[0])
+
+    _BUCKET.acquire()
     params = {
         "action": "query",
         "list": "prefixsearch",
-        "pssearch": f"Category:{query.strip()}",
+        "pssearch": f"Category:{query}",
         "psnamespace": 14,
         "pslimit": str(limit),
         "format": "json"
     }
 
-    response = requests.get(COMMONS_API, params=params, headers=HEADERS, timeout=30)
+    response = _SESSION.get(COMMONS_API, params=params, timeout=(HTTP_CONNECT_TIMEOUT, 30))
     response.raise_for_status()
-    data = response.json()
+    data = _json_loads(response.content)
 
-    results = []
     items = data.get("query", {}).get("prefixsearch", [])
-    for item in items:
-        title = item.get("title", "")
-        if title.startswith("Category:"):
-            title = title[len("Category:"):]
-        if title:
-            results.append(title)
+    titles = [item.get("title", "") for item in items]
+    titles = [t[len("Category:"):] if t.startswith("Category:") else t for t in titles]
+    suggestions = tuple(title for title in titles if title)
 
-    return results
+    with _suggest_cache_lock:
+        _suggest_cache[cache_key] = (suggestions, now)
+        _suggest_cache.move_to_end(cache_key)
+        while len(_suggest_cache) > _SUGGEST_CACHE_MAX:
+            _suggest_cache.popitem(last=False)
+    return list(suggestions)
 
 
-@retry_on_failure(max_retries=3, base_delay=1.0)
 def fetch_category_files(category_name: str) -> List[str]:
     """
     Fetch all file titles from a Wikimedia Commons category.
@@ -191,124 +284,143 @@ def fetch_category_files(category_name: str) -> List[str]:
         ValueError: If category doesn't exist or is empty
         requests.exceptions.RequestException: If API call fails after retries
     """
-    # Normalize category name
-    if not category_name.startswith("Category:"):
-        category_name = f"Category:{category_name}"
+    return list(fetch_category_revisions(category_name))
 
-    # Validate category exists before fetching
-    exists, error_msg = validate_category_exists(category_name)
-    if not exists:
-        raise ValueError(error_msg)
 
-    files = []
+def fetch_category_revisions(category_name: str) -> Dict[str, Optional[int]]:
+    """
+    Fetch all files of a Wikimedia Commons category with their latest page
+    revision ID. Structured data lives on the file page, so a depicts edit
+    always changes the revision.
+
+    Args:
+        category_name: Category name (with or without 'Category:' prefix)
+
+    Returns:
+        Dict of file title -> lastrevid (e.g., {'File:Example.jpg': 123, ...})
+
+    Raises:
+        ValueError: If category doesn't exist
+        requests.exceptions.RequestException: If API call fails after retries
+    """
+    # Normalize category name
+    category_name = normalize_category(category_name)
+
+    files: Dict[str, Optional[int]] = {}
+    # categorymembers as a generator with prop=info: the member listing and
+    # each page's lastrevid come back in the same 500-page requests.
     params = {
         "action": "query",
-        "list": "categorymembers",
-        "cmtitle": category_name,
-        "cmtype": "file",
-        "cmlimit": "500",  # Max allowed per request
+        "generator": "categorymembers",
+        "gcmtitle": category_name,
+        "gcmtype": "file",
+        "gcmlimit": "500",  # Max allowed per request
+        "prop": "info",
         "format": "json"
     }
 
     page_count = 0
     while True:
-        _rate_limit()  # Rate limit each request
-        response = requests.get(COMMONS_API, params=params, headers=HEADERS, timeout=90)
+        _BUCKET.acquire()  # Rate limit each request
+        response = _SESSION.get(COMMONS_API, params=params, timeout=(HTTP_CONNECT_TIMEOUT, 90))
         response.raise_for_status()
-        data = response.json()
+        data = _json_loads(response.content)
 
-        # Extract file titles
-        members = data.get("query", {}).get("categorymembers", [])
-        for member in members:
-            files.append(member["title"])
+        for page in data.get("query", {}).get("pages", {}).values():
+            files[page["title"]] = page.get("lastrevid")
 
         page_count += 1
         print(f"  [API] Fetched page {page_count}, total files so far: {len(files)}")
 
-        # Check for more pages
+        # Check for more pages (the generator and prop=info continue together)
         if "continue" in data:
-            params["cmcontinue"] = data["continue"]["cmcontinue"]
+            params.update(data["continue"])
         else:
             break
 
+    if not files:
+        # An empty listing may mean the category itself does not exist
+        exists, error = validate_category_exists(category_name)
+        if not exists:
+            raise ValueError(error or f"Category '{category_name}' does not exist on Wikimedia Commons")
+
     return files
 
 
-@retry_on_failure(max_retries=2, base_delay=0.5)
-def check_depicts(file_title: str) -> Tuple[bool, List[str]]:
-    """
-    Check if a Commons file has depicts (P180) statements.
+def _extract_p180_qids(entity: Dict[str, Any]) -> List[str]:
+    """Return the QIDs referenced by an SDC entity's depicts (P180) statements."""
+    qids: List[str] = []
+    try:
+        claims = entity["statements"]["P180"]
+    except (KeyError, TypeError):
+        # No statements at all ("statements" may be [] for empty entities)
+        return qids
 
-    Uses Structured Data on Commons (SDC) via wbgetentities.
+    qids_append = qids.append
+    for claim in claims:
+        try:
+            datavalue = claim["mainsnak"]["datavalue"]
+            if datavalue["type"] == "wikibase-entityid":
+                qid = datavalue["value"]["id"]
+                if qid:
+                    qids_append(qid)
+        except KeyError:
+            # somevalue/novalue snaks carry no datavalue
+            pass
+    return qids
 
-    Args:
-        file_title: File title (e.g., 'File:Example.jpg')
 
-    Returns:
-        Tuple of (has_depicts: bool, qid_list: list of QIDs)
+def _fetch_sdc_by_titles(file_titles: List[str], props: str = "info|claims") -> Dict[str, Any]:
+    """
+    Fetch MediaInfo entities for up to 50 files in one wbgetentities call.
+
+    Looks entities up by title (sites=commonswiki) so no separate pageid
+    query is needed to build the M-prefixed IDs. Only the requested props are
+    returned: "claims" carries the statements, "info" adds the page title
+    needed to map entities back to files when several are requested.
     """
-    # Get the media ID (M-prefixed) for the file
-    # First, get the page ID
     params = {
-        "action": "query",
-        "titles": file_title,
+        "action": "wbgetentities",
+        "sites": "commonswiki",
+        "titles": "|".join(file_titles),
+        "props": props,
         "format": "json"
     }
 
-    _rate_limit()  # Rate limit
-    response = requests.get(COMMONS_API, params=params, headers=HEADERS, timeout=30)
-    response.raise_for_status()
-    data = response.json()
-
-    pages = data.get("query", {}).get("pages", {})
-    if not pages:
-        return (False, [])
-
-    page_id = list(pages.keys())[0]
-    if page_id == "-1":
-        return (False, [])  # File not found
-
-    # Now get the structured data using the M-prefixed ID
-    media_id = f"M{page_id}"
+    _BUCKET.acquire()
+    return _fetch_entities(COMMONS_API, params)
 
-    sdc_params = {
-        "action": "wbgetentities",
-        "ids": media_id,
-        "format": "json"
-    }
 
-    _rate_limit()  # Rate limit
-    sdc_response = requests.get(COMMONS_API, params=sdc_params, headers=HEADERS, timeout=30)
-    sdc_response.raise_for_status()
-    sdc_data = sdc_response.json()
+def check_depicts(file_title: str) -> Tuple[bool, List[str]]:
+    """
+    Check if a Commons file has depicts (P180) statements.
 
-    entity = sdc_data.get("entities", {}).get(media_id, {})
-    statements = entity.get("statements", {})
+    Uses Structured Data on Commons (SDC) via wbgetentities.
 
-    # Check for P180 (depicts) property
-    p180_claims = statements.get("P180", [])
+    Args:
+        file_title: File title (e.g., 'File:Example.jpg')
 
-    if not p180_claims:
-        return (False, [])
+    Returns:
+        Tuple of (has_depicts: bool, qid_list: list of QIDs)
+    """
+    # A single title needs no mapping back, so skip the "info" prop
+    entities = _fetch_sdc_by_titles([file_title], props="claims")
 
-    # Extract QIDs from depicts claims
-    qids = []
-    for claim in p180_claims:
-        mainsnak = claim.get("mainsnak", {})
-        datavalue = mainsnak.get("datavalue", {})
-        if datavalue.get("type") == "wikibase-entityid":
-            qid = datavalue.get("value", {}).get("id")
-            if qid:
-                qids.append(qid)
+    for entity_id, entity in entities.items():
+        if entity_id.startswith("M"):
+            qids = _extract_p180_qids(entity)
+            return (len(qids) > 0, qids)
 
-    return (len(qids) > 0, qids)
+    return (False, [])  # File not found
 
 
-@retry_on_failure(max_retries=2, base_delay=0.5)
 def check_depicts_batch(file_titles: List[str]) -> Dict[str, Tuple[bool, List[str]]]:
     """
     Check multiple Commons files for depicts (P180) statements in batches.
 
+    Titles are looked up 50 at a time (the wbgetentities limit), one request
+    per chunk.
+
     Args:
         file_titles: List of file titles (e.g., ['File:Example.jpg', ...])
 
@@ -316,78 +428,27 @@ def check_depicts_batch(file_titles: List[str]) -> Dict[str, Tuple[bool, List[st
         Dict mapping file title to (has_depicts, qid_list)
     """
     results: Dict[str, Tuple[bool, List[str]]] = {title: (False, []) for title in file_titles}
-    if not file_titles:
-        return results
-
-    params = {
-        "action": "query",
-        "titles": "|".join(file_titles),
-        "format": "json"
-    }
-
-    _rate_limit()
-    response = requests.get(COMMONS_API, params=params, headers=HEADERS, timeout=30)
-    response.raise_for_status()
-    data = response.json()
-
-    pages = data.get("query", {}).get("pages", {})
-    if not pages:
-        return results
-
-    media_ids: List[str] = []
-    media_to_title: Dict[str, str] = {}
-
-    for page_id, page in pages.items():
-        title = page.get("title")
-        if not title or page_id == "-1":
-            continue
-        media_id = f"M{page_id}"
-        media_ids.append(media_id)
-        media_to_title[media_id] = title
-
-    if not media_ids:
-        return results
-
-    sdc_params = {
-        "action": "wbgetentities",
-        "ids": "|".join(media_ids),
-        "format": "json"
-    }
 
-    _rate_limit()
-    sdc_response = requests.get(COMMONS_API, params=sdc_params, headers=HEADERS, timeout=30)
-    sdc_response.raise_for_status()
-    sdc_data = sdc_response.json()
-
-    entities = sdc_data.get("entities", {})
-    for media_id, entity in entities.items():
-        title = media_to_title.get(media_id)
-        if not title:
-            continue
-
-        statements = entity.get("statements", {})
-        p180_claims = statements.get("P180", [])
-
-        qids: List[str] = []
-        for claim in p180_claims:
-            mainsnak = claim.get("mainsnak", {})
-            datavalue = mainsnak.get("datavalue", {})
-            if datavalue.get("type") == "wikibase-entityid":
-                qid = datavalue.get("value", {}).get("id")
-                if qid:
-                    qids.append(qid)
+    for i in range(0, len(file_titles), 50):
+        entities = _fetch_sdc_by_titles(file_titles[i:i + 50])
+        for entity_id, entity in entities.items():
+            title = entity.get("title")
+            # Missing files come back keyed by negative placeholder IDs
+            if title not in results or not entity_id.startswith("M"):
+                continue
 
-        results[title] = (len(qids) > 0, qids)
+            qids = _extract_p180_qids(entity)
+            results[title] = (len(qids) > 0, qids)
 
     return results
 
 
-@retry_on_failure(max_retries=2, base_delay=0.5)
 def resolve_labels(qids: List[str], language: str = "en") -> Dict[str, str]:
     """
     Resolve Wikidata QIDs to labels in specified language.
 
-    Uses caching to avoid repeated API calls for the same QIDs.
+    Uses a two-tier cache to avoid repeated API calls for the same QIDs:
+    an in-process LRU, backed by the persistent labels table.
 
     Args:
         qids: List of QIDs (e.g., ['Q123', 'Q456'])
@@ -401,11 +462,13 @@ def resolve_labels(qids: List[str], language: str = "en") -> Dict[str, str]:
 
     result = {}
     qids_to_fetch = []
+    now = time.monotonic()
+    _evict_expired(now)
 
-    # Check cache first (cache key includes language)
-    for qid in qids:
-        cache_key = f"{qid}:{language}"
-        cached = _cache_get(cache_key)
+    # Check cache first (cache key is a (qid, language) tuple). Duplicate QIDs
+    # are collapsed (order-preserving) so each is looked up and fetched once.
+    for qid in dict.fromkeys(qids):
+        cached = _cache_get((qid, language))
         if cached is not None:
             result[qid] = cached
         else:
@@ -414,66 +477,74 @@ def resolve_labels(qids: List[str], language: str = "en") -> Dict[str, str]:
     if not qids_to_fetch:
         return result
 
-    # Fetch uncached labels (batch up to 50 at a time)
-    for i in range(0, len(qids_to_fetch), 50):
-        batch = qids_to_fetch[i:i + 50]
+    # Second tier: labels persisted by earlier runs / other workers. The
+    # database is an optimization only, so failures fall through to the API.
+    try:
+        stored = get_cached_labels(qids_to_fetch, language)
+    except Exception as e:
+        print(f"  [CACHE] Label cache read failed: {e}")
+        stored = {}
+    for qid, label in stored.items():
+        result[qid] = label
+        _cache_set((qid, language), label, now)
+    qids_to_fetch = [qid for qid in qids_to_fetch if qid not in stored]
 
-        params = {
+    if not qids_to_fetch:
+        return result
+
+    # Fetch uncached labels (batch up to 50 at a time, batches in parallel)
+    params_list = [
+        {
             "action": "wbgetentities",
-            "ids": "|".join(batch),
+            "ids": "|".join(qids_to_fetch[i:i + 50]),
             "props": "labels",
             "languages": language,
             "format": "json"
         }
-
-        response = requests.get(WIKIDATA_API, params=params, headers=HEADERS, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-
-        entities = data.get("entities", {})
+        for i in range(0, len(qids_to_fetch), 50)
+    ]
+
+    if len(params_list) == 1:
+        batch_entities = [_fetch_entities(WIKIDATA_API, params_list[0])]
+    else:
+        workers = min(_LABEL_FETCH_WORKERS, len(params_list))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            batch_entities = list(executor.map(lambda p: _fetch_entities(WIKIDATA_API, p), params_list))
+
+    fetched = {}
+    for entities in batch_entities:
         for qid, entity in entities.items():
             labels = entity.get("labels", {})
             # Try requested language, fallback to English, then QID
             label = labels.get(language, {}).get("value") or labels.get("en", {}).get("value", qid)
-            result[qid] = label
-            _cache_set(f"{qid}:{language}", label)
+            fetched[qid] = label
+            _cache_set((qid, language), label, now)
+    result.update(fetched)
 
-    return result
+    try:
+        cache_labels(fetched, language)
+    except Exception as e:
+        print(f"  [CACHE] Label cache write failed: {e}")
 
+    return result
 
-@retry_on_failure(max_retries=2, base_delay=0.5)
-def fetch_file_info(file_title: str) -> Dict[str, Any]:
-    """
-    Fetch detailed file information from Wikimedia Commons.
 
-    Args:
-        file_title: File title (e.g., 'File:Example.jpg')
+class _HTMLStripper(HTMLParser):
+    """Collects the text content of an HTML fragment."""
 
-    Returns:
-        Dict with thumbnail URL, dimensions, size, description, upload date, etc.
-    """
-    if not file_title.startswith("File:"):
-        file_title = f"File:{file_title}"
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
 
-    params = {
-        "action": "query",
-        "titles": file_title,
-        "prop": "imageinfo",
-        "iiprop": "url|size|extmetadata|timestamp|mime|user",
-        "iiurlwidth": 800,
-        "format": "json"
-    }
+    def handle_data(self, data: str) -> None:
+        self._parts.append(data)
 
-    _rate_limit()
-    response = requests.get(COMMONS_API, params=params, headers=HEADERS, timeout=30)
-    response.raise_for_status()
-    data = response.json()
+    def get_data(self) -> str:
+        return "".join(self._parts)
 
-    pages = data.get("query", {}).get("pages", {})
-    if not pages:
-        return {"error": "File not found"}
 
-    page = list(pages.values())[0]
+def _parse_file_info(file_title: str, page: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the file info dict from one imageinfo query page."""
     if "imageinfo" not in page:
         return {"error": "No image info available"}
 
@@ -482,22 +553,9 @@ def fetch_file_info(file_title: str) -> Dict[str, Any]:
 
     # Extract description — strip HTML using a proper parser (not regex)
     description_raw = extmeta.get("ImageDescription", {}).get("value", "")
-    from html.parser import HTMLParser as _HTMLParser
-
-    class _Stripper(_HTMLParser):
-        def __init__(self):
-            super().__init__(convert_charrefs=True)
-            self._parts: list = []
-
-        def handle_data(self, data: str) -> None:
-            self._parts.append(data)
-
-        def get_data(self) -> str:
-            return "".join(self._parts)
-
-    _stripper = _Stripper()
-    _stripper.feed(description_raw)
-    description = _stripper.get_data().strip()
+    stripper = _HTMLStripper()
+    stripper.feed(description_raw)
+    description = stripper.get_data().strip()
 
     return {
         "title": file_title,
@@ -515,6 +573,84 @@ def fetch_file_info(file_title: str) -> Dict[str, Any]:
     }
 
 
+def fetch_file_info_batch(file_titles: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch detailed file information for many files, 50 titles per request.
+
+    Args:
+        file_titles: File titles (e.g., ['File:Example.jpg', ...])
+
+    Returns:
+        Dict mapping each requested title to its info dict (same shape as
+        fetch_file_info, including the {"error": ...} form)
+    """
+    titles = [t if t.startswith("File:") else f"File:{t}" for t in file_titles]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    for i in range(0, len(titles), 50):
+        batch = titles[i:i + 50]
+        params = {
+            "action": "query",
+            "titles": "|".join(batch),
+            "prop": "imageinfo",
+            "iiprop": "url|size|extmetadata|timestamp|mime|user",
+            "iiurlwidth": 800,
+            "format": "json"
+        }
+
+        _BUCKET.acquire()
+        response = _SESSION.get(COMMONS_API, params=params, timeout=(HTTP_CONNECT_TIMEOUT, 30))
+        response.raise_for_status()
+        query = _json_loads(response.content).get("query", {})
+
+        # Map API-normalized titles (e.g. underscores -> spaces) back to ours
+        normalized = {n["to"]: n["from"] for n in query.get("normalized", [])}
+        for page in query.get("pages", {}).values():
+            title = page.get("title", "")
+            title = normalized.get(title, title)
+            results[title] = _parse_file_info(title, page)
+
+    for title in titles:
+        results.setdefault(title, {"error": "File not found"})
+    return results
+
+
+def fetch_file_info(file_title: str) -> Dict[str, Any]:
+    """
+    Fetch detailed file information from Wikimedia Commons.
+
+    Args:
+        file_title: File title (e.g., 'File:Example.jpg')
+
+    Returns:
+        Dict with thumbnail URL, dimensions, size, description, upload date, etc.
+    """
+    if not file_title.startswith("File:"):
+        file_title = f"File:{file_title}"
+
+    return fetch_file_info_batch([file_title])[file_title]
+
+
+def _search_entities(query: str, limit: int = 3) -> List[Dict[str, Any]]:
+    """Search Wikidata items matching a query; returns [] on any failure."""
+    params = {
+        "action": "wbsearchentities",
+        "search": query,
+        "language": "en",
+        "format": "json",
+        "limit": limit,
+        "type": "item"
+    }
+
+    try:
+        _BUCKET.acquire()
+        response = _SESSION.get(WIKIDATA_API, params=params, timeout=(HTTP_CONNECT_TIMEOUT, 15))
+        response.raise_for_status()
+        return _json_loads(response.content).get("search", [])
+    except Exception:
+        return []
+
+
 def suggest_depicts(file_title: str, limit: int = 5) -> List[Dict[str, str]]:
     """
     Suggest Wikidata Q-items based on keywords parsed from a file's title.
@@ -529,31 +665,20 @@ def suggest_depicts(file_title: str, limit: int = 5) -> List[Dict[str, str]]:
     Returns:
         List of dicts with 'qid', 'label', 'description' keys
     """
-    import re
-
     # Strip prefix and extension
     name = file_title.replace("File:", "")
-    name = re.sub(r'\.[a-zA-Z0-9]+$', '', name)  # Remove extension
+    name = _EXT_RE.sub('', name)  # Remove extension
 
     # Replace common separators with spaces
     name = name.replace("_", " ").replace("-", " ")
 
     # Remove common wiki noise patterns
-    name = re.sub(r'\b\d{4,}\b', '', name)  # Remove years/numbers
-    name = re.sub(r'\b[A-Z]{2,5}\s*\d+\b', '', name)  # e.g., "DSC 1234"
-    name = re.sub(r'\bIMG\b|\bDSC\b|\bP\d+\b|\bIMGP\b', '', name, flags=re.IGNORECASE)
-
-    # Split into meaningful keywords (3+ chars)
-    stopwords = {
-        'the', 'and', 'for', 'from', 'with', 'this', 'that', 'are', 'was',
-        'has', 'have', 'been', 'not', 'but', 'its', 'his', 'her', 'their',
-        'our', 'can', 'will', 'may', 'jpg', 'jpeg', 'png', 'svg', 'tif',
-        'tiff', 'gif', 'file', 'image', 'photo', 'picture', 'crop', 'edit',
-        'version', 'original', 'commons', 'wiki', 'wikipedia'
-    }
+    name = _YEAR_RE.sub('', name)  # Remove years/numbers
+    name = _CAMERA_ID_RE.sub('', name)  # e.g., "DSC 1234"
+    name = _NOISE_RE.sub('', name)
 
-    words = name.split()
-    keywords = [w.strip() for w in words if len(w.strip()) >= 3 and w.strip().lower() not in stopwords]
+    # Split into meaningful keywords (3+ chars); split() already strips whitespace
+    keywords = [w for w in name.split() if len(w) >= 3 and w.lower() not in _STOPWORDS]
 
     if not keywords:
         return []
@@ -581,40 +706,35 @@ def suggest_depicts(file_title: str, limit: int = 5) -> List[Dict[str, str]]:
             seen.add(ql)
             unique_queries.append(q)
 
-    suggestions = []
-    seen_qids = set()
+    if not unique_queries:
+        return []
 
-    for query in unique_queries:
-        if len(suggestions) >= limit:
-            break
+    suggestions: List[Dict[str, str]] = []
+    seen_qids = set()
 
-        try:
-            params = {
-                "action": "wbsearchentities",
-                "search": query,
-                "language": "en",
-                "format": "json",
-                "limit": 3,
-                "type": "item"
-            }
-
-            _rate_limit()
-            response = requests.get(WIKIDATA_API, params=params, headers=HEADERS, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-
-            for result in data.get("search", []):
-                qid = result.get("id", "")
-                if qid and qid not in seen_qids:
-                    seen_qids.add(qid)
-                    suggestions.append({
-                        "qid": qid,
-                        "label": result.get("label", qid),
-                        "description": result.get("description", "")
-                    })
-                    if len(suggestions) >= limit:
-                        break
-        except Exception:
-            continue
+    def collect(results: List[Dict[str, Any]]) -> None:
+        for result in results:
+            if len(suggestions) >= limit:
+                return
+            qid = result.get("id", "")
+            if qid and qid not in seen_qids:
+                seen_qids.add(qid)
+                suggestions.append({
+                    "qid": qid,
+                    "label": result.get("label", qid),
+                    "description": result.get("description", "")
+                })
+
+    # The most specific query (full phrase when available) usually fills the
+    # quota on its own, so ask it for `limit` results and stop there if it does
+    collect(_search_entities(unique_queries[0], limit))
+    fallback_queries = unique_queries[1:]
+    if len(suggestions) >= limit or not fallback_queries:
+        return suggestions
+
+    # Otherwise run the keyword searches concurrently, merging in query order
+    with ThreadPoolExecutor(max_workers=len(fallback_queries)) as executor:
+        for results in executor.map(_search_entities, fallback_queries):
+            collect(results)
 
     return suggestions
@@ -11,41 +11,63 @@ try:
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
 
-    # Total count
-    cursor.execute('SELECT COUNT(*) FROM files')
-    total = cursor.fetchone()[0]
-    print(f"\nTotal files stored: {total}")
-
-    # Per category
+    # Per-category counts and the grand total in one pass
     cursor.execute('''
-        SELECT category,
-               COUNT(*) as total,
-               SUM(has_depicts) as with_depicts
-        FROM files
-        GROUP BY category
+        WITH agg AS (
+            SELECT category,
+                   COUNT(*) as total,
+                   SUM(has_depicts) as with_depicts
+            FROM files
+            GROUP BY category
+        )
+        SELECT category, total, with_depicts, SUM(total) OVER () as grand_total
+        FROM agg
         ORDER BY total DESC
     ''')
+    rows = cursor.fetchall()
+
+    total = rows[0][3] if rows else 0
+    print(f"\nTotal files stored: {total}")
 
     print(f"\n{'Category':<40} {'Files':<8} {'With P180':<10} {'Coverage'}")
     print("-" * 70)
 
-    for row in cursor.fetchall():
-        cat = row[0]
-        total_files = row[1]
-        with_depicts = row[2] or 0
+    for cat, total_files, with_depicts, _ in rows:
+        with_depicts = with_depicts or 0
         coverage = (with_depicts / total_files * 100) if total_files > 0 else 0
         print(f"{cat:<40} {total_files:<8} {with_depicts:<10} {coverage:.0f}%")
 
-    # Sample records
+    # Sample records: first 5 per category, picked by SQLite in one query
+    print(f"\n{'='*60}")
+    print("SAMPLE RECORDS (first 5 per category)")
+    print(f"{'='*60}")
+    cursor.execute('''
+        SELECT file_name, category, depicts, has_depicts
+        FROM (
+            SELECT file_name, category, depicts, has_depicts,
+                   ROW_NUMBER() OVER (PARTITION BY category ORDER BY file_name) as rn
+            FROM files
+        )
+        WHERE rn <= 5
+        ORDER BY category, rn
+    ''')
+    for file_name, cat, depicts, has_depicts in cursor.fetchall():
+        print(f"\nFile: {file_name}")
+        print(f"  Category: {cat}")
+        print(f"  Depicts: {depicts or 'None'}")
+        print(f"  Has P180: {'Yes' if has_depicts else 'No'}")
+
+    # Confirm the per-category listing is served by the composite index
     print(f"\n{'='*60}")
-    print("SAMPLE RECORDS (first 5)")
+    print("QUERY PLAN (per-category file listing)")
     print(f"{'='*60}")
-    cursor.execute('SELECT file_name, category, depicts, has_depicts FROM files LIMIT 5')
-    for row in cursor.fetchall():
-        print(f"\nFile: {row[0]}")
-        print(f"  Category: {row[1]}")
-        print(f"  Depicts: {row[2] or 'None'}")
-        print(f"  Has P180: {'Yes' if row[3] else 'No'}")
+    cursor.execute(
+        'EXPLAIN QUERY PLAN SELECT file_name, depicts, has_depicts FROM files '
+        'WHERE category = ? ORDER BY has_depicts DESC, file_name ASC',
+        (rows[0][0] if rows else '',)
+    )
+    for plan_row in cursor.fetchall():
+        print(f"  {plan_row[-1]}")
 
     conn.close()
     print(f"\n{'='*60}")
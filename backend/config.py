@@ -106,7 +106,27 @@ RATE_LIMIT_AUTH = os.environ.get("RATE_LIMIT_AUTH", "5 per minute")
 RATE_LIMIT_CALLBACK = os.environ.get("RATE_LIMIT_CALLBACK", "10 per minute")
 RATE_LIMIT_API_WRITE = os.environ.get("RATE_LIMIT_API_WRITE", "30 per minute")
 
+# ============ Shared State ============
+# Optional Redis URL (e.g. redis://localhost:6379/0). When set, background
+# job progress is shared by all workers instead of kept per process.
+REDIS_URL = os.environ.get("REDIS_URL", "")
+# Optional RQ queue name. With REDIS_URL set, analysis jobs are enqueued here
+# for separate `rq worker` processes instead of running in a web worker thread.
+RQ_QUEUE = os.environ.get("RQ_QUEUE", "")
+
 # ============ Application Settings ============
 HOST = os.environ.get("HOST", "127.0.0.1")
 PORT = int(os.environ.get("PORT", 5000))
 DEBUG = not IS_PRODUCTION and os.environ.get("DEBUG", "true").lower() == "true"
+
+# ============ Analysis Settings ============
+# When a category is analyzed again, files whose Commons page is unchanged
+# since their stored result (same revision and label language) are not
+# re-checked, as long as that result is at most this many minutes old; the
+# cap bounds how stale stored depicts labels can get (0 = always re-check)
+ANALYSIS_REUSE_MINUTES = int(os.environ.get("ANALYSIS_REUSE_MINUTES", "10080"))
+# Concurrent 50-file batches per analysis. Each batch holds one pooled HTTP
+# connection (plus label lookups), so keep this well below api.HTTP_POOL_MAXSIZE.
+DEPICTS_WORKERS = max(1, int(os.environ.get("DEPICTS_WORKERS", "6")))
+# Analyses run at the same time per process; more wait in the queued state
+MAX_CONCURRENT_ANALYSES = max(1, int(os.environ.get("MAX_CONCURRENT_ANALYSES", "4")))
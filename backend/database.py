@@ -5,11 +5,15 @@ SQLite for local development, PostgreSQL on Railway (or any DATABASE_URL).
 DATABASE_URL is set automatically by Railway when a Postgres service is linked.
 """
 
+import atexit
+import hashlib
+import json
 import os
 import queue
 import threading
 from contextlib import contextmanager
-from typing import List, Dict, Any, Optional
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
 
 DATABASE_URL = os.environ.get("DATABASE_URL", "")
 
@@ -19,6 +23,11 @@ if DATABASE_URL.startswith("postgres://"):
 
 USE_POSTGRES = bool(DATABASE_URL)
 
+
+class DatabaseBusyError(RuntimeError):
+    """Raised when no pooled database connection becomes free in time."""
+
+
 # ── SQLite setup ──────────────────────────────────────────────────────────────
 if not USE_POSTGRES:
     import sqlite3
@@ -26,40 +35,105 @@ if not USE_POSTGRES:
     DB_PATH = os.path.abspath(
         os.path.join(os.path.dirname(__file__), "..", "data", "depicts.db")
     )
+    # WAL allows one writer alongside any number of readers, so writes go
+    # through a single shared connection and reads through a small pool of
+    # query_only connections that never take the write lock.
     _POOL_SIZE = 5
+    _POOL_WAIT_TIMEOUT = 5  # seconds a reader waits for a busy pool
     _pool: queue.LifoQueue = queue.LifoQueue(maxsize=_POOL_SIZE)
-    _pool_lock = threading.Lock()
-    _pool_created = 0
-
-    def _create_sqlite_conn():
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-        conn.row_factory = sqlite3.Row
-        conn.execute("PRAGMA journal_mode=WAL")
-        conn.execute("PRAGMA busy_timeout=5000")
+    # One slot per reader that may still be created; never released once a
+    # connection exists, since pooled connections live for the process.
+    _pool_slots = threading.BoundedSemaphore(_POOL_SIZE)
+    _writer_conn = None
+    _writer_lock = threading.Lock()
+
+    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+
+    def _create_sqlite_conn(query_only: bool = False):
+        # Every statement is a static constant, so a larger per-connection
+        # statement cache keeps all of them prepared across calls.
+        # isolation_level=None turns off the module's implicit BEGIN; the
+        # writer opens its own transactions (see _get_writer).
+        conn = sqlite3.connect(
+            DB_PATH, check_same_thread=False, cached_statements=256, isolation_level=None
+        )
+        # page_size only takes effect while the file is still empty, so it
+        # has to precede journal_mode (which writes the header); existing
+        # databases keep their page size.
+        conn.executescript("""
+            PRAGMA page_size=8192;
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-20000;
+            PRAGMA mmap_size=268435456;
+            PRAGMA busy_timeout=5000;
+        """)
+        if query_only:
+            conn.execute("PRAGMA query_only=1")
         return conn
 
     @contextmanager
-    def _get_connection():
-        global _pool_created
-        conn = None
+    def _get_reader():
         try:
             conn = _pool.get_nowait()
         except queue.Empty:
-            with _pool_lock:
-                if _pool_created < _POOL_SIZE:
-                    conn = _create_sqlite_conn()
-                    _pool_created += 1
-                else:
-                    conn = _pool.get(timeout=5)
+            if _pool_slots.acquire(blocking=False):
+                try:
+                    conn = _create_sqlite_conn(query_only=True)
+                except BaseException:
+                    _pool_slots.release()
+                    raise
+            else:
+                # Every reader exists and is busy; wait (bounded) for one to
+                # come back rather than hanging the request thread
+                try:
+                    conn = _pool.get(timeout=_POOL_WAIT_TIMEOUT)
+                except queue.Empty:
+                    raise DatabaseBusyError("All database connections are busy") from None
         try:
             yield conn
         finally:
-            if conn is not None:
+            _pool.put_nowait(conn)
+
+    @contextmanager
+    def _get_writer():
+        """
+        Yield the writer inside BEGIN IMMEDIATE, so the write lock is taken
+        up front instead of upgraded mid-transaction. conn.commit() still
+        works; anything left open is committed on exit.
+        """
+        global _writer_conn
+        with _writer_lock:
+            if _writer_conn is None:
+                _writer_conn = _create_sqlite_conn()
+            conn = _writer_conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            if conn.in_transaction:
+                conn.commit()
+
+    def _close_pool():
+        """Run PRAGMA optimize on the writer and close every connection."""
+        while True:
+            try:
+                _pool.get_nowait().close()
+            except queue.Empty:
+                break
+        with _writer_lock:
+            if _writer_conn is not None:
                 try:
-                    _pool.put_nowait(conn)
-                except queue.Full:
-                    conn.close()
+                    _writer_conn.execute("PRAGMA optimize")
+                    _writer_conn.close()
+                except sqlite3.Error:
+                    pass
+
+    atexit.register(_close_pool)
 
 # ── PostgreSQL setup ──────────────────────────────────────────────────────────
 else:
@@ -78,26 +152,37 @@ else:
         finally:
             _pg_pool.putconn(conn)
 
+    # Postgres handles reader/writer concurrency itself
+    _get_reader = _get_connection
+    _get_writer = _get_connection
+
 
 # ── Static SQL (no f-strings — placeholders are dialect constants) ────────────
 # SQLite uses ?, PostgreSQL uses %s. Defined once here, used throughout.
+# has_depicts is stored as 0/1, so SUM(has_depicts) counts files with depicts.
 
+# The last parameter says whether the row is a real check result; rows saved
+# after a failed check get analyzed_at NULL so they are never reused.
 _SQL_INSERT_PG = """
-    INSERT INTO files (file_name, category, depicts, has_depicts, analyzed_at)
-    VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+    INSERT INTO files (file_name, category, depicts, has_depicts, revision, language, analyzed_at)
+    VALUES (%s, %s, %s, %s, %s, %s, CASE WHEN %s THEN CURRENT_TIMESTAMP END)
     ON CONFLICT (file_name, category) DO UPDATE SET
         depicts     = EXCLUDED.depicts,
         has_depicts = EXCLUDED.has_depicts,
-        analyzed_at = CURRENT_TIMESTAMP
+        revision    = EXCLUDED.revision,
+        language    = EXCLUDED.language,
+        analyzed_at = EXCLUDED.analyzed_at
 """
 
 _SQL_INSERT_SQ = """
-    INSERT INTO files (file_name, category, depicts, has_depicts, analyzed_at)
-    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    INSERT INTO files (file_name, category, depicts, has_depicts, revision, language, analyzed_at)
+    VALUES (?, ?, ?, ?, ?, ?, CASE WHEN ? THEN CURRENT_TIMESTAMP END)
     ON CONFLICT(file_name, category) DO UPDATE SET
         depicts     = excluded.depicts,
         has_depicts = excluded.has_depicts,
-        analyzed_at = CURRENT_TIMESTAMP
+        revision    = excluded.revision,
+        language    = excluded.language,
+        analyzed_at = excluded.analyzed_at
 """
 
 _SQL_SELECT_FILES_PG = """
@@ -114,39 +199,315 @@ _SQL_SELECT_FILES_SQ = """
     ORDER BY has_depicts DESC, file_name ASC
 """
 
-_SQL_STATS_PG = """
-    SELECT
-        COUNT(*) as total,
-        SUM(CASE WHEN has_depicts = 1 THEN 1 ELSE 0 END) as with_depicts,
-        SUM(CASE WHEN has_depicts = 0 THEN 1 ELSE 0 END) as without_depicts
-    FROM files WHERE category = %s
+# Keyset page in the same order as above: rows after (has_depicts, file_name)
+# under has_depicts DESC, file_name ASC, walked straight off the index.
+_SQL_SELECT_PAGE_PG = """
+    SELECT file_name, depicts, has_depicts
+    FROM files
+    WHERE category = %s
+      AND (has_depicts < %s OR (has_depicts = %s AND file_name > %s))
+    ORDER BY has_depicts DESC, file_name ASC
+    LIMIT %s
 """
 
-_SQL_STATS_SQ = """
-    SELECT
-        COUNT(*) as total,
-        SUM(CASE WHEN has_depicts = 1 THEN 1 ELSE 0 END) as with_depicts,
-        SUM(CASE WHEN has_depicts = 0 THEN 1 ELSE 0 END) as without_depicts
-    FROM files WHERE category = ?
+_SQL_SELECT_PAGE_SQ = """
+    SELECT file_name, depicts, has_depicts
+    FROM files
+    WHERE category = ?
+      AND (has_depicts < ? OR (has_depicts = ? AND file_name > ?))
+    ORDER BY has_depicts DESC, file_name ASC
+    LIMIT ?
 """
 
-_SQL_COUNT_PG = "SELECT COUNT(*) as cnt FROM files WHERE category = %s"
-_SQL_COUNT_SQ = "SELECT COUNT(*) as cnt FROM files WHERE category = ?"
+# Equality on both leading columns of idx_files_cat_has_name: a range scan
+# that only touches the matching rows, already in file_name order
+_SQL_WITHOUT_DEPICTS_PG = """
+    SELECT file_name FROM files WHERE category = %s AND has_depicts = 0 ORDER BY file_name
+"""
+_SQL_WITHOUT_DEPICTS_SQ = """
+    SELECT file_name FROM files WHERE category = ? AND has_depicts = 0 ORDER BY file_name
+"""
 
-_SQL_SAMPLE_PG = "SELECT file_name, depicts, has_depicts FROM files WHERE category = %s LIMIT 5"
-_SQL_SAMPLE_SQ = "SELECT file_name, depicts, has_depicts FROM files WHERE category = ? LIMIT 5"
+_SQL_REVISION_PG = """
+    SELECT version, total, with_depicts, last_analyzed FROM category_stats WHERE category = %s
+"""
+_SQL_REVISION_SQ = """
+    SELECT version, total, with_depicts, last_analyzed FROM category_stats WHERE category = ?
+"""
+
+# Served from the trigger-maintained category_stats row (one key lookup)
+_SQL_STATS_PG = "SELECT total, with_depicts FROM category_stats WHERE category = %s"
+_SQL_STATS_SQ = "SELECT total, with_depicts FROM category_stats WHERE category = ?"
+
+# Count plus up to 5 sample rows in one statement; every row repeats the
+# count, and an empty category yields a single row of NULL samples.
+_SQL_VERIFY_PG = """
+    WITH c AS (SELECT COUNT(*) AS cnt FROM files WHERE category = %s),
+         s AS (SELECT file_name, depicts, has_depicts FROM files WHERE category = %s LIMIT 5)
+    SELECT c.cnt, s.file_name, s.depicts, s.has_depicts
+    FROM c LEFT JOIN s ON TRUE
+"""
+
+_SQL_VERIFY_SQ = """
+    WITH c AS (SELECT COUNT(*) AS cnt FROM files WHERE category = ?),
+         s AS (SELECT file_name, depicts, has_depicts FROM files WHERE category = ? LIMIT 5)
+    SELECT c.cnt, s.file_name, s.depicts, s.has_depicts
+    FROM c LEFT JOIN s ON 1
+"""
 
 _SQL_DELETE_PG = "DELETE FROM files WHERE category = %s"
 _SQL_DELETE_SQ = "DELETE FROM files WHERE category = ?"
 
+# Incremental re-analysis: file lists are passed as one parameter (array on
+# Postgres, JSON text on SQLite), like the label cache queries below.
+# Stored rows whose page revision is still current: the file (and so its
+# depicts statements) has not been edited since it was analyzed. The SQLite
+# variant takes a JSON object of {file_name: revision}; CROSS JOIN keeps
+# json_each as the outer loop, so each key is a primary key lookup rather than
+# a scan of the whole category.
+_SQL_UNCHANGED_FILES_PG = """
+    SELECT f.file_name
+    FROM files f
+    JOIN unnest(%s::text[], %s::bigint[]) AS c(file_name, revision)
+      ON f.file_name = c.file_name AND f.revision = c.revision
+    WHERE f.category = %s AND f.language = %s
+      AND f.analyzed_at > CURRENT_TIMESTAMP - (%s * INTERVAL '1 minute')
+"""
+
+_SQL_UNCHANGED_FILES_SQ = """
+    SELECT f.file_name
+    FROM json_each(?) c
+    CROSS JOIN files f ON f.file_name = c.key AND f.revision = c.value
+    WHERE f.category = ? AND f.language = ?
+      AND f.analyzed_at > datetime('now', '-' || ? || ' minutes')
+"""
+
+_SQL_DELETE_MISSING_PG = "DELETE FROM files WHERE category = %s AND NOT (file_name = ANY(%s))"
+_SQL_DELETE_MISSING_SQ = """
+    DELETE FROM files
+    WHERE category = ? AND file_name NOT IN (SELECT value FROM json_each(?))
+"""
+
+_SQL_MARK_STALE_PG = "UPDATE files SET analyzed_at = NULL WHERE file_name = %s"
+_SQL_MARK_STALE_SQ = "UPDATE files SET analyzed_at = NULL WHERE file_name = ?"
+
+# Per-category summary maintained by triggers on files, so the dashboard
+# queries read one row per category instead of grouping the whole table.
+# last_analyzed only moves forward; deletes and stale marks don't rewind it.
+# version is bumped on every row change and backs the HTTP ETags.
+_SQL_CATEGORY_STATS = """
+    SELECT category, total, with_depicts, last_analyzed
+    FROM category_stats
+    ORDER BY category ASC
+"""
+
+_SQL_BACKFILL_STATS = """
+    INSERT INTO category_stats (category, total, with_depicts, last_analyzed)
+    SELECT category, COUNT(*), SUM(has_depicts), MAX(analyzed_at)
+    FROM files
+    WHERE NOT EXISTS (SELECT 1 FROM category_stats)
+    GROUP BY category
+"""
+
+# Arbitrary application-wide key for pg_advisory_xact_lock: serializes init_db
+# across workers booting at once, released when its transaction commits.
+_PG_INIT_LOCK_KEY = 0x63646131
+
+_SQL_HAS_STATS_TRIGGER_PG = "SELECT 1 FROM pg_trigger WHERE tgname = 'trg_files_category_stats'"
+
+_DDL_STATS_TRIGGERS_PG = (
+    """
+    CREATE OR REPLACE FUNCTION files_category_stats() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO category_stats (category, total, with_depicts, last_analyzed)
+            VALUES (NEW.category, 1, NEW.has_depicts, NEW.analyzed_at)
+            ON CONFLICT (category) DO UPDATE SET
+                version       = category_stats.version + 1,
+                total         = category_stats.total + 1,
+                with_depicts  = category_stats.with_depicts + NEW.has_depicts,
+                last_analyzed = GREATEST(category_stats.last_analyzed, NEW.analyzed_at);
+        ELSIF TG_OP = 'UPDATE' THEN
+            UPDATE category_stats SET
+                version       = version + 1,
+                with_depicts  = with_depicts + NEW.has_depicts - OLD.has_depicts,
+                last_analyzed = GREATEST(last_analyzed, NEW.analyzed_at)
+            WHERE category = NEW.category;
+        ELSE
+            UPDATE category_stats SET
+                version      = version + 1,
+                total        = total - 1,
+                with_depicts = with_depicts - OLD.has_depicts
+            WHERE category = OLD.category;
+            DELETE FROM category_stats WHERE category = OLD.category AND total <= 0;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS trg_files_category_stats ON files",
+    """
+    CREATE TRIGGER trg_files_category_stats
+    AFTER INSERT OR UPDATE OF has_depicts, analyzed_at OR DELETE ON files
+    FOR EACH ROW EXECUTE PROCEDURE files_category_stats()
+    """,
+)
+
+_DDL_STATS_TRIGGERS_SQ = (
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_files_stats_insert AFTER INSERT ON files
+    BEGIN
+        INSERT INTO category_stats (category, total, with_depicts, last_analyzed)
+        VALUES (NEW.category, 1, NEW.has_depicts, NEW.analyzed_at)
+        ON CONFLICT(category) DO UPDATE SET
+            version       = version + 1,
+            total         = total + 1,
+            with_depicts  = with_depicts + NEW.has_depicts,
+            last_analyzed = COALESCE(MAX(last_analyzed, NEW.analyzed_at), last_analyzed, NEW.analyzed_at);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_files_stats_update
+    AFTER UPDATE OF has_depicts, analyzed_at ON files
+    BEGIN
+        UPDATE category_stats SET
+            version       = version + 1,
+            with_depicts  = with_depicts + NEW.has_depicts - OLD.has_depicts,
+            last_analyzed = COALESCE(MAX(last_analyzed, NEW.analyzed_at), last_analyzed, NEW.analyzed_at)
+        WHERE category = NEW.category;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_files_stats_delete AFTER DELETE ON files
+    BEGIN
+        UPDATE category_stats SET
+            version      = version + 1,
+            total        = total - 1,
+            with_depicts = with_depicts - OLD.has_depicts
+        WHERE category = OLD.category;
+        DELETE FROM category_stats WHERE category = OLD.category AND total <= 0;
+    END
+    """,
+)
+
+# Label cache: QID lists are passed as a single parameter (array on Postgres,
+# JSON text on SQLite) so the statements stay static.
+_LABEL_TTL_DAYS = 7
+
+_SQL_GET_LABELS_PG = """
+    SELECT qid, label FROM labels
+    WHERE language = %s AND qid = ANY(%s)
+      AND cached_at > CURRENT_TIMESTAMP - (%s * INTERVAL '1 day')
+"""
+
+_SQL_GET_LABELS_SQ = """
+    SELECT qid, label FROM labels
+    WHERE language = ? AND qid IN (SELECT value FROM json_each(?))
+      AND cached_at > datetime('now', '-' || ? || ' days')
+"""
+
+_SQL_PUT_LABEL_PG = """
+    INSERT INTO labels (qid, language, label, cached_at)
+    VALUES (%s, %s, %s, CURRENT_TIMESTAMP)
+    ON CONFLICT (qid, language) DO UPDATE SET
+        label     = EXCLUDED.label,
+        cached_at = CURRENT_TIMESTAMP
+"""
+
+_SQL_PUT_LABEL_SQ = """
+    INSERT INTO labels (qid, language, label, cached_at)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(qid, language) DO UPDATE SET
+        label     = excluded.label,
+        cached_at = CURRENT_TIMESTAMP
+"""
+
+
+# Bumped whenever the SQLite schema built by init_db changes (a new
+# _migrate_sqlite step, table, index or trigger): a database already at this
+# version skips init_db's DDL entirely.
+_SCHEMA_VERSION = 4
+_initialized = False
+
+# The natural key is the primary key, so rows live in a single B-tree
+# ordered by (file_name, category) with no rowid or separate UNIQUE index.
+_DDL_FILES_SQ = """
+    CREATE TABLE IF NOT EXISTS files (
+        file_name   TEXT NOT NULL,
+        category    TEXT NOT NULL,
+        depicts     TEXT,
+        has_depicts INTEGER NOT NULL,
+        revision    INTEGER,
+        language    TEXT,
+        analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (file_name, category)
+    ) WITHOUT ROWID
+"""
+
 
 # ── Public API ────────────────────────────────────────────────────────────────
 
+@lru_cache(maxsize=1024)
+def normalize_category(category: str) -> str:
+    """Return the category title with its 'Category:' prefix (memoized)."""
+    return category if category.startswith("Category:") else "Category:" + category
+
+
+def _migrate_sqlite(cur) -> None:
+    """Apply pending SQLite schema migrations, tracked in PRAGMA user_version."""
+    version = cur.execute("PRAGMA user_version").fetchone()[0]
+    if version >= _SCHEMA_VERSION:
+        return
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(files)")}
+    if version < 1:
+        # Databases from before analyzed_at existed; fresh ones already have it.
+        # SQLite rejects a CURRENT_TIMESTAMP default on ADD COLUMN, and every
+        # insert sets analyzed_at explicitly anyway.
+        if "analyzed_at" not in columns:
+            cur.execute("ALTER TABLE files ADD COLUMN analyzed_at TIMESTAMP")
+    if version < 2 and "id" in columns:
+        # Rebuild the old rowid table (surrogate id + UNIQUE index) as a
+        # WITHOUT ROWID table clustered on (file_name, category). Indexes and
+        # triggers go with the old table and are recreated by init_db.
+        cur.execute(_DDL_FILES_SQ.replace("files (", "files_new (", 1))
+        cur.execute("""
+            INSERT INTO files_new (file_name, category, depicts, has_depicts, analyzed_at)
+            SELECT file_name, category, depicts, has_depicts, analyzed_at FROM files
+        """)
+        cur.execute("DROP TABLE files")
+        cur.execute("ALTER TABLE files_new RENAME TO files")
+    if version < 3:
+        # category_stats gained a change counter; its triggers are recreated
+        stats_columns = {row[1] for row in cur.execute("PRAGMA table_info(category_stats)")}
+        if stats_columns and "version" not in stats_columns:
+            cur.execute("ALTER TABLE category_stats ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        for trigger in ("trg_files_stats_insert", "trg_files_stats_update", "trg_files_stats_delete"):
+            cur.execute("DROP TRIGGER IF EXISTS " + trigger)
+    if version < 4:
+        # Page revision and label language of each analysis, for reuse checks.
+        # Re-read: step 2 may have just rebuilt the table with these columns.
+        columns = {row[1] for row in cur.execute("PRAGMA table_info(files)")}
+        if "revision" not in columns:
+            cur.execute("ALTER TABLE files ADD COLUMN revision INTEGER")
+        if "language" not in columns:
+            cur.execute("ALTER TABLE files ADD COLUMN language TEXT")
+    cur.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+
 def init_db() -> None:
     """Create tables and indexes if they don't exist."""
-    with _get_connection() as conn:
+    global _initialized
+    if _initialized:
+        return
+    with _get_writer() as conn:
         cur = conn.cursor()
+        if not USE_POSTGRES and cur.execute("PRAGMA user_version").fetchone()[0] == _SCHEMA_VERSION:
+            _initialized = True
+            return
         if USE_POSTGRES:
+            # Every worker runs init_db on boot; without the lock their DDL
+            # would race each other on the files table.
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (_PG_INIT_LOCK_KEY,))
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS files (
                     id          SERIAL PRIMARY KEY,
@@ -154,158 +515,234 @@ def init_db() -> None:
                     category    TEXT NOT NULL,
                     depicts     TEXT,
                     has_depicts INTEGER NOT NULL,
+                    revision    BIGINT,
+                    language    TEXT,
                     analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     UNIQUE (file_name, category)
                 )
             """)
-            cur.execute(
-                "CREATE INDEX IF NOT EXISTS idx_files_category ON files(category)"
-            )
+            cur.execute("ALTER TABLE files ADD COLUMN IF NOT EXISTS revision BIGINT")
+            cur.execute("ALTER TABLE files ADD COLUMN IF NOT EXISTS language TEXT")
         else:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS files (
-                    id          INTEGER PRIMARY KEY AUTOINCREMENT,
-                    file_name   TEXT NOT NULL,
-                    category    TEXT NOT NULL,
-                    depicts     TEXT,
-                    has_depicts INTEGER NOT NULL,
-                    analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE(file_name, category)
-                )
-            """)
-            try:
-                cur.execute("SELECT analyzed_at FROM files LIMIT 1")
-            except Exception:
-                cur.execute(
-                    "ALTER TABLE files ADD COLUMN analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP"
-                )
+            cur.execute(_DDL_FILES_SQ)
+            _migrate_sqlite(cur)
+        # Serves WHERE category = ? ORDER BY has_depicts DESC, file_name
+        # straight from the index (no sort step) and covers the per-category
+        # counts; it also makes the old single-column category index redundant.
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_files_cat_has_name "
+            "ON files(category, has_depicts DESC, file_name ASC)"
+        )
+        cur.execute("DROP INDEX IF EXISTS idx_files_category")
+        # Persistent QID label cache shared by all workers (dialect-neutral DDL)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS labels (
+                qid       TEXT NOT NULL,
+                language  TEXT NOT NULL,
+                label     TEXT NOT NULL,
+                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (qid, language)
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS category_stats (
+                category      TEXT PRIMARY KEY,
+                total         INTEGER NOT NULL DEFAULT 0,
+                with_depicts  INTEGER NOT NULL DEFAULT 0,
+                last_analyzed TIMESTAMP,
+                version       INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        if USE_POSTGRES:
             cur.execute(
-                "CREATE INDEX IF NOT EXISTS idx_files_category ON files(category)"
+                "ALTER TABLE category_stats ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0"
             )
+        if USE_POSTGRES:
+            # DROP/CREATE TRIGGER takes an exclusive lock on files, so only
+            # install the triggers once rather than on every boot
+            cur.execute(_SQL_HAS_STATS_TRIGGER_PG)
+            install_triggers = cur.fetchone() is None
+        else:
+            install_triggers = True
+        if install_triggers:
+            for ddl in (_DDL_STATS_TRIGGERS_PG if USE_POSTGRES else _DDL_STATS_TRIGGERS_SQ):
+                cur.execute(ddl)
+            # Seed the summary from existing rows the first time it is created
+            cur.execute(_SQL_BACKFILL_STATS)
         conn.commit()
+    _initialized = True
 
 
 def insert_file(
-    file_name: str, category: str, depicts: Optional[str], has_depicts: bool
+    file_name: str, category: str, depicts: Optional[str], has_depicts: bool,
+    revision: Optional[int] = None, language: Optional[str] = None
 ) -> None:
     sql = _SQL_INSERT_PG if USE_POSTGRES else _SQL_INSERT_SQ
-    with _get_connection() as conn:
+    with _get_writer() as conn:
         cur = conn.cursor()
-        cur.execute(sql, (file_name, category, depicts, 1 if has_depicts else 0))
+        cur.execute(sql, (file_name, category, depicts, 1 if has_depicts else 0, revision, language, True))
         conn.commit()
 
 
-def get_files_by_category(category: str) -> List[Dict[str, Any]]:
-    sql = _SQL_SELECT_FILES_PG if USE_POSTGRES else _SQL_SELECT_FILES_SQ
-    with _get_connection() as conn:
+def insert_files_bulk(
+    rows: Iterable[Tuple[str, str, Optional[str], bool, Optional[int], Optional[str]]],
+    checked: bool = True
+) -> None:
+    """
+    Upsert many (file_name, category, depicts, has_depicts, revision,
+    language) rows in one transaction, so a whole batch costs a single commit.
+    Pass checked=False for placeholder rows saved after a failed check: they
+    are stored without analyzed_at, so later analyses always re-check them.
+    """
+    params = [(f, c, d, 1 if h else 0, r, lang, checked) for f, c, d, h, r, lang in rows]
+    if not params:
+        return
+    with _get_writer() as conn:
+        cur = conn.cursor()
         if USE_POSTGRES:
-            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            psycopg2.extras.execute_batch(cur, _SQL_INSERT_PG, params)
         else:
-            cur = conn.cursor()
+            cur.executemany(_SQL_INSERT_SQ, params)
+        conn.commit()
+
+
+def get_files_by_category(category: str) -> List[Dict[str, Any]]:
+    sql = _SQL_SELECT_FILES_PG if USE_POSTGRES else _SQL_SELECT_FILES_SQ
+    with _get_reader() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, (category,))
+        return [
+            {"file_name": file_name, "depicts": depicts, "has_depicts": has_depicts}
+            for file_name, depicts, has_depicts in cur.fetchall()
+        ]
+
+
+def iter_files_by_category(
+    category: str, chunk_size: int = 500
+) -> Iterator[Tuple[str, Optional[str], int]]:
+    """
+    Yield (file_name, depicts, has_depicts) tuples for a category without
+    materializing the whole result set. Rows are read in keyset pages of
+    chunk_size, each on a pooled connection that is returned before the page
+    is yielded, so a slow consumer (e.g. a streaming download) never holds a
+    connection while it waits.
+    """
+    after = None
+    while True:
+        rows = _select_page(category, after, chunk_size)
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        after = (rows[-1][2], rows[-1][0])
+
+
+def _select_page(
+    category: str, after: Optional[Tuple[int, str]], limit: int
+) -> List[Tuple[str, Optional[str], int]]:
+    # has_depicts is 0/1, so (2, "") sorts ahead of every row
+    has_depicts, file_name = after if after is not None else (2, "")
+    sql = _SQL_SELECT_PAGE_PG if USE_POSTGRES else _SQL_SELECT_PAGE_SQ
+    with _get_reader() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, (category, has_depicts, has_depicts, file_name, limit))
+        return cur.fetchall()
+
+
+def get_files_by_category_page(
+    category: str, after: Optional[Tuple[int, str]] = None, limit: int = 500
+) -> List[Dict[str, Any]]:
+    """
+    Return up to `limit` files of a category that sort after the
+    (has_depicts, file_name) key `after`, in get_files_by_category order.
+    Pass the last row's key back in to fetch the next page.
+    """
+    return [
+        {"file_name": name, "depicts": depicts, "has_depicts": has_dep}
+        for name, depicts, has_dep in _select_page(category, after, limit)
+    ]
+
+
+def get_files_without_depicts(category: str) -> List[str]:
+    """Return the names of a category's stored files that lack depicts."""
+    sql = _SQL_WITHOUT_DEPICTS_PG if USE_POSTGRES else _SQL_WITHOUT_DEPICTS_SQ
+    with _get_reader() as conn:
+        cur = conn.cursor()
         cur.execute(sql, (category,))
-        return [dict(r) for r in cur.fetchall()]
+        return [file_name for (file_name,) in cur.fetchall()]
+
+
+def get_category_revision(category: str) -> Optional[str]:
+    """
+    Return a short token that changes whenever the category's stored files
+    change (for HTTP ETags), or None if nothing is stored for it.
+    """
+    sql = _SQL_REVISION_PG if USE_POSTGRES else _SQL_REVISION_SQ
+    with _get_reader() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, (category,))
+        row = cur.fetchone()
+    if row is None:
+        return None
+    # total/last_analyzed keep the token distinct if a cleared category is
+    # re-created and its counter starts over
+    return hashlib.sha1(repr(row).encode()).hexdigest()[:20]
 
 
 def get_statistics(category: str) -> Dict[str, int]:
     sql = _SQL_STATS_PG if USE_POSTGRES else _SQL_STATS_SQ
-    with _get_connection() as conn:
-        if USE_POSTGRES:
-            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        else:
-            cur = conn.cursor()
+    with _get_reader() as conn:
+        cur = conn.cursor()
         cur.execute(sql, (category,))
-        row = dict(cur.fetchone())
-        if row and row["total"]:
-            return {
-                "total": int(row["total"]),
-                "with_depicts": int(row["with_depicts"] or 0),
-                "without_depicts": int(row["without_depicts"] or 0),
-            }
-        return {"total": 0, "with_depicts": 0, "without_depicts": 0}
+        total, with_dep = cur.fetchone() or (0, 0)
+        return {
+            "total": total,
+            "with_depicts": with_dep,
+            "without_depicts": total - with_dep,
+        }
 
 
-def get_all_categories() -> List[Dict[str, Any]]:
-    sql = """
-        SELECT
-            category,
-            COUNT(*) as total_files,
-            SUM(CASE WHEN has_depicts = 1 THEN 1 ELSE 0 END) as with_depicts,
-            MAX(analyzed_at) as last_analyzed
-        FROM files
-        GROUP BY category
-        ORDER BY category ASC
-    """
-    with _get_connection() as conn:
-        if USE_POSTGRES:
-            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        else:
-            cur = conn.cursor()
-        cur.execute(sql)
-        result = []
-        for row in cur.fetchall():
-            row = dict(row)
-            total = int(row["total_files"])
-            with_dep = int(row["with_depicts"] or 0)
-            result.append({
-                "category": row["category"],
+def _category_summaries() -> List[Dict[str, Any]]:
+    """Read the per-category summary rows shared by the listing endpoints."""
+    with _get_reader() as conn:
+        cur = conn.cursor()
+        cur.execute(_SQL_CATEGORY_STATS)
+        return [
+            {
+                "category": category,
                 "total_files": total,
                 "with_depicts": with_dep,
                 "without_depicts": total - with_dep,
-                "last_analyzed": row["last_analyzed"],
-            })
-        return result
+                "last_analyzed": last_analyzed,
+            }
+            for category, total, with_dep, last_analyzed in cur.fetchall()
+        ]
+
+
+def get_all_categories() -> List[Dict[str, Any]]:
+    return _category_summaries()
 
 
 def get_history_stats() -> List[Dict[str, Any]]:
-    sql = """
-        SELECT
-            category,
-            COUNT(*) as total,
-            SUM(CASE WHEN has_depicts = 1 THEN 1 ELSE 0 END) as with_depicts,
-            SUM(CASE WHEN has_depicts = 0 THEN 1 ELSE 0 END) as without_depicts,
-            MAX(analyzed_at) as last_analyzed
-        FROM files
-        GROUP BY category
-        ORDER BY category ASC
-    """
-    with _get_connection() as conn:
-        if USE_POSTGRES:
-            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        else:
-            cur = conn.cursor()
-        cur.execute(sql)
-        history = []
-        for row in cur.fetchall():
-            row = dict(row)
-            total = int(row["total"])
-            with_dep = int(row["with_depicts"] or 0)
-            history.append({
-                "category": row["category"],
-                "total": total,
-                "total_files": total,
-                "with_depicts": with_dep,
-                "without_depicts": total - with_dep,
-                "last_analyzed": row["last_analyzed"],
-            })
-        return history
+    history = _category_summaries()
+    for entry in history:
+        entry["total"] = entry["total_files"]
+    return history
 
 
 def verify_category_saved(category: str) -> Dict[str, Any]:
-    if not category.startswith("Category:"):
-        category = f"Category:{category}"
-    sql_count = _SQL_COUNT_PG if USE_POSTGRES else _SQL_COUNT_SQ
-    sql_sample = _SQL_SAMPLE_PG if USE_POSTGRES else _SQL_SAMPLE_SQ
-    with _get_connection() as conn:
-        if USE_POSTGRES:
-            cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        else:
-            cur = conn.cursor()
-        cur.execute(sql_count, (category,))
-        count = int(dict(cur.fetchone())["cnt"])
+    category = normalize_category(category)
+    sql = _SQL_VERIFY_PG if USE_POSTGRES else _SQL_VERIFY_SQ
+    with _get_reader() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, (category, category))
+        rows = cur.fetchall()
+        count = int(rows[0][0])
         if count == 0:
             return {"verified": False, "category": category, "record_count": 0}
-        cur.execute(sql_sample, (category,))
-        samples = [dict(r) for r in cur.fetchall()]
+        samples = [
+            {"file_name": file_name, "depicts": depicts, "has_depicts": has_depicts}
+            for _, file_name, depicts, has_depicts in rows
+        ]
         return {
             "verified": True,
             "category": category,
@@ -315,8 +752,99 @@ def verify_category_saved(category: str) -> Dict[str, Any]:
 
 
 def clear_category(category: str) -> None:
+    clear_categories([category])
+
+
+def clear_categories(categories: Iterable[str]) -> None:
+    """
+    Delete the stored rows of several categories in one transaction. Each
+    delete is a range scan on idx_files_cat_has_name (category leads it).
+    """
+    params = [(category,) for category in categories]
+    if not params:
+        return
     sql = _SQL_DELETE_PG if USE_POSTGRES else _SQL_DELETE_SQ
-    with _get_connection() as conn:
+    with _get_writer() as conn:
         cur = conn.cursor()
-        cur.execute(sql, (category,))
+        cur.executemany(sql, params)
+        conn.commit()
+
+
+def analyze_files() -> None:
+    """
+    Refresh planner statistics for the files table after a bulk load so the
+    composite index is chosen for the per-category queries.
+    """
+    with _get_writer() as conn:
+        cur = conn.cursor()
+        if not USE_POSTGRES:
+            # Sample rather than scan every row on large databases
+            cur.execute("PRAGMA analysis_limit = 1000")
+        cur.execute("ANALYZE files")
+        conn.commit()
+
+
+def get_unchanged_file_names(
+    category: str, revisions: Dict[str, int], language: str, max_age_minutes: int
+) -> Set[str]:
+    """
+    Return which files in revisions ({file_name: current page revision}) have
+    a stored result for category that was made at that same revision, in the
+    same label language, within max_age_minutes.
+    """
+    revisions = {name: rev for name, rev in revisions.items() if rev is not None}
+    if not revisions or max_age_minutes <= 0:
+        return set()
+    with _get_reader() as conn:
+        cur = conn.cursor()
+        if USE_POSTGRES:
+            cur.execute(_SQL_UNCHANGED_FILES_PG, (
+                list(revisions), list(revisions.values()), category, language, max_age_minutes
+            ))
+        else:
+            cur.execute(_SQL_UNCHANGED_FILES_SQ, (json.dumps(revisions), category, language, max_age_minutes))
+        return {row[0] for row in cur.fetchall()}
+
+
+def delete_files_not_in(category: str, file_names: List[str]) -> None:
+    """Drop stored rows for files that are no longer members of category."""
+    with _get_writer() as conn:
+        cur = conn.cursor()
+        if USE_POSTGRES:
+            cur.execute(_SQL_DELETE_MISSING_PG, (category, list(file_names)))
+        else:
+            cur.execute(_SQL_DELETE_MISSING_SQ, (category, json.dumps(list(file_names))))
+        conn.commit()
+
+
+def mark_file_stale(file_name: str) -> None:
+    """Force the next analysis of any category containing file_name to re-check it."""
+    sql = _SQL_MARK_STALE_PG if USE_POSTGRES else _SQL_MARK_STALE_SQ
+    with _get_writer() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, (file_name,))
+        conn.commit()
+
+
+def get_cached_labels(qids: List[str], language: str) -> Dict[str, str]:
+    """Return cached labels for the given QIDs that are younger than the TTL."""
+    if not qids:
+        return {}
+    with _get_reader() as conn:
+        cur = conn.cursor()
+        if USE_POSTGRES:
+            cur.execute(_SQL_GET_LABELS_PG, (language, list(qids), _LABEL_TTL_DAYS))
+        else:
+            cur.execute(_SQL_GET_LABELS_SQ, (language, json.dumps(list(qids)), _LABEL_TTL_DAYS))
+        return {row[0]: row[1] for row in cur.fetchall()}
+
+
+def cache_labels(labels: Dict[str, str], language: str) -> None:
+    """Store resolved QID labels, refreshing any existing entries."""
+    if not labels:
+        return
+    sql = _SQL_PUT_LABEL_PG if USE_POSTGRES else _SQL_PUT_LABEL_SQ
+    with _get_writer() as conn:
+        cur = conn.cursor()
+        cur.executemany(sql, [(qid, language, label) for qid, label in labels.items()])
         conn.commit()
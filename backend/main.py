@@ -20,35 +20,99 @@ import time
 import uuid
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import timedelta
-from flask import Flask, request, jsonify, send_from_directory, redirect, session
+from flask import Flask, Response, request, jsonify, send_from_directory, redirect, session
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_session import Session
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.middleware.proxy_fix import ProxyFix
 
-from api import (fetch_category_files, check_depicts_batch, resolve_labels,
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import rq
+except ImportError:
+    rq = None
+
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
+
+from api import (fetch_category_revisions, check_depicts_batch, resolve_labels,
                  fetch_category_suggestions, fetch_file_info, suggest_depicts)
-from database import (init_db, insert_file, get_files_by_category,
-                      get_statistics, clear_category, verify_category_saved, get_all_categories)
+from database import (init_db, insert_files_bulk, get_files_by_category, get_files_by_category_page,
+                      iter_files_by_category, get_category_revision, normalize_category, get_statistics,
+                      clear_category, verify_category_saved, get_all_categories, get_unchanged_file_names,
+                      delete_files_not_in, mark_file_stale, analyze_files, get_files_without_depicts,
+                      DatabaseBusyError)
 from config import (
     FLASK_SECRET_KEY, ALLOWED_ORIGINS, IS_PRODUCTION,
     SESSION_LIFETIME_MINUTES, SESSION_COOKIE_SECURE,
     SESSION_COOKIE_HTTPONLY, SESSION_COOKIE_SAMESITE,
     RATE_LIMIT_DEFAULT, RATE_LIMIT_AUTH, RATE_LIMIT_CALLBACK, RATE_LIMIT_API_WRITE,
-    HOST, PORT, DEBUG
+    HOST, PORT, DEBUG, ANALYSIS_REUSE_MINUTES, DEPICTS_WORKERS, MAX_CONCURRENT_ANALYSES,
+    REDIS_URL, RQ_QUEUE
 )
 from oauth import (is_oauth_configured, get_authorize_url, exchange_code_for_token,
-                   get_user_profile, add_depicts_statement, revoke_token)
+                   get_user_profile, add_depicts_statement, add_depicts_statements_batch, revoke_token)
 from security import (
     validate_qid, validate_file_title, validate_category, add_security_headers,
-    generate_csrf_token, csrf_required, login_required
+    generate_csrf_token, csrf_required, login_required, store_session_tokens, ensure_fresh_token,
+    FRONTEND_ENDPOINTS
 )
 
 logger = logging.getLogger("app")
 
+
+class _OrjsonProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by orjson. Keys stay sorted like the default
+    provider, and dates/decimals still go through Flask's own `default`.
+    """
+
+    def _option(self, sort_keys: bool, indent: bool) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = self._option(kwargs.get("sort_keys", self.sort_keys), kwargs.get("indent"))
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """
+        jsonify() without the str round trip: the base class decodes the
+        serialized bytes, appends a newline and encodes them again, which
+        copies large result bodies twice. Here orjson's bytes are the body.
+        """
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        option = self._option(self.sort_keys, pretty) | orjson.OPT_APPEND_NEWLINE
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option), mimetype=self.mimetype
+        )
+
+
 # ============ Initialize Flask App ============
 app = Flask(__name__, static_folder="../frontend")
+if orjson is not None:
+    app.json = _OrjsonProvider(app)
 # Tell Flask it is behind a proxy (Railway) so request.is_secure works correctly
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_prefix=1)
 app.secret_key = FLASK_SECRET_KEY
@@ -60,36 +124,86 @@ def request_too_large(e):
     return jsonify({"error": "Request body too large (max 5 MB)"}), 413
 
 
+@app.errorhandler(DatabaseBusyError)
+def database_busy(e):
+    response = jsonify({"error": "The server is busy, please try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
 # --- Server-Side Session Configuration ---
-# Sessions stored on filesystem (NOT in browser cookies)
-_session_dir = os.path.join(tempfile.gettempdir(), "cda_sessions")
-os.makedirs(_session_dir, mode=0o700, exist_ok=True)
-try:
-    os.chmod(_session_dir, 0o700)
-except OSError:
-    pass
-app.config["SESSION_TYPE"] = "filesystem"
-app.config["SESSION_FILE_DIR"] = _session_dir
+# Sessions stored server-side (NOT in browser cookies): in Redis when
+# REDIS_URL is configured, so every worker sees them, else on the filesystem
+_USE_REDIS = bool(REDIS_URL) and redis is not None
+if _USE_REDIS:
+    app.config["SESSION_TYPE"] = "redis"
+    app.config["SESSION_REDIS"] = redis.from_url(REDIS_URL)
+else:
+    _session_dir = os.path.join(tempfile.gettempdir(), "cda_sessions")
+    os.makedirs(_session_dir, mode=0o700, exist_ok=True)
+    try:
+        os.chmod(_session_dir, 0o700)
+    except OSError:
+        pass
+    app.config["SESSION_TYPE"] = "filesystem"
+    app.config["SESSION_FILE_DIR"] = _session_dir
 app.config["SESSION_PERMANENT"] = True
 app.config["SESSION_USE_SIGNER"] = True  # Sign session ID cookie
 app.config["SESSION_KEY_PREFIX"] = "cda_"  # Namespace sessions
 app.config["PERMANENT_SESSION_LIFETIME"] = timedelta(minutes=SESSION_LIFETIME_MINUTES)
+# Only write the session back when it changed; refreshing it on every request
+# re-pickled it to disk/Redis for each poll and static file. The lifetime
+# still slides for logged-in users: see _extend_session below.
+app.config["SESSION_REFRESH_EACH_REQUEST"] = False
 app.config["SESSION_COOKIE_SECURE"] = SESSION_COOKIE_SECURE
 app.config["SESSION_COOKIE_HTTPONLY"] = SESSION_COOKIE_HTTPONLY
 app.config["SESSION_COOKIE_SAMESITE"] = SESSION_COOKIE_SAMESITE
 Session(app)
 
+# Half the lifetime, in seconds: how stale a logged-in session may get before
+# a request re-saves it (pushing its expiry out by a full lifetime)
+_SESSION_EXTEND_AFTER = SESSION_LIFETIME_MINUTES * 30
+
+
+@app.before_request
+def _extend_session():
+    """Keep active logins alive with one session write per half lifetime."""
+    if request.endpoint in FRONTEND_ENDPOINTS or "access_token" not in session:
+        return
+    now = time.time()
+    if now - session.get("_extended_at", 0) > _SESSION_EXTEND_AFTER:
+        session["_extended_at"] = now
+
+
 # --- CORS: Locked to Whitelisted Origins ---
 CORS(app, origins=ALLOWED_ORIGINS, supports_credentials=True)
 
+# --- Response Compression ---
+# Results, exports and history compress ~10x. text/event-stream is left out
+# so progress events are not held back in the compressor's buffer. Streamed
+# bodies (the CSV export, unpaged results) go out uncompressed: flask-compress
+# would otherwise buffer the whole stream in memory to compress it.
+if Compress is not None:
+    app.config["COMPRESS_MIMETYPES"] = [
+        "application/json", "text/csv", "text/html", "text/css",
+        "text/javascript", "application/javascript"
+    ]
+    app.config["COMPRESS_LEVEL"] = 6
+    app.config["COMPRESS_ALGORITHM"] = ["br", "gzip"]
+    app.config["COMPRESS_STREAMS"] = False
+    # Answer If-None-Match with a 304 even after the ETag gains its ":gzip"
+    app.config["COMPRESS_EVALUATE_CONDITIONAL_REQUEST"] = True
+    Compress(app)
+
 # --- Rate Limiting ---
-# NOTE: memory:// storage resets on restart and does not scale across multiple
-# workers or processes. For production, use Redis: storage_uri="redis://..."
+# Counters live in Redis when REDIS_URL is set so limits hold across workers.
+# NOTE: the memory:// fallback resets on restart and is per process.
+# Default fixed-window strategy: moving-window costs O(limit) per hit in Redis.
 limiter = Limiter(
     get_remote_address,
     app=app,
     default_limits=[RATE_LIMIT_DEFAULT],
-    storage_uri="memory://"
+    storage_uri=REDIS_URL if _USE_REDIS else "memory://"
 )
 
 # --- Security Headers on Every Response ---
@@ -135,12 +249,7 @@ def analyze_category(category_name: str, progress_callback=None, progress_hook=N
     Returns:
         Analysis results dict
     """
-    # Normalize category name
-    if not category_name.startswith("Category:"):
-        category_name = f"Category:{category_name}"
-
-    # Clear previous results for this category
-    clear_category(category_name)
+    category_name = normalize_category(category_name)
 
     # Step 1: Fetch all files
     if progress_callback:
@@ -155,77 +264,116 @@ def analyze_category(category_name: str, progress_callback=None, progress_hook=N
         })
 
     try:
-        files = fetch_category_files(category_name)
+        revisions = fetch_category_revisions(category_name)
     except ValueError as e:
         # Category validation error (doesn't exist)
         return {"error": str(e)}
     except Exception as e:
         return {"error": f"Failed to fetch category: {str(e)}"}
 
+    files = list(revisions)
     if not files:
+        clear_category(category_name)
         return {"error": "No files found in category"}
 
+    # Reuse stored rows for files whose page has not been edited since they
+    # were analyzed (same revision, same label language); only new or changed
+    # files are re-checked. Files that have left the category are dropped.
+    if ANALYSIS_REUSE_MINUTES > 0:
+        delete_files_not_in(category_name, files)
+        unchanged = get_unchanged_file_names(category_name, revisions, language, ANALYSIS_REUSE_MINUTES)
+        to_check = [f for f in files if f not in unchanged] if unchanged else files
+    else:
+        clear_category(category_name)
+        to_check = files
+
     # Step 2: Check each file for depicts
     total = len(files)
+    processed = total - len(to_check)
 
     if progress_hook:
         progress_hook({
             "phase": "checking",
             "message": "Checking depicts statements",
-            "processed": 0,
+            "processed": processed,
             "total": total
         })
 
     batch_size = 50
-    batches = [files[i:i + batch_size] for i in range(0, total, batch_size)]
-    max_workers = min(6, max(1, len(batches)))
-    processed = 0
-
-    def process_batch(batch_files: list) -> dict:
-        return check_depicts_batch(batch_files)
+    batches = [to_check[i:i + batch_size] for i in range(0, len(to_check), batch_size)]
+    max_workers = min(DEPICTS_WORKERS, max(1, len(batches)))
+
+    def process_batch(batch_files: list) -> tuple:
+        # Depicts check and label lookup both run in the worker, so label
+        # round trips overlap with other batches instead of serializing here
+        batch_results = check_depicts_batch(batch_files)
+        batch_qids = set()
+        for _, qids in batch_results.values():
+            batch_qids.update(qids)
+        try:
+            labels = resolve_labels(list(batch_qids), language) if batch_qids else {}
+        except Exception as e:
+            print(f"Error resolving labels: {e}", file=sys.stderr)
+            labels = {}
+        return batch_results, labels
 
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         future_map = {executor.submit(process_batch, batch): batch for batch in batches}
 
-        for future in as_completed(future_map):
-            batch = future_map[future]
-            try:
-                batch_results = future.result()
-            except Exception as e:
-                print(f"Error processing batch: {e}", file=sys.stderr)
-                batch_results = {title: (False, []) for title in batch}
-
-            batch_qids = set()
-            for title in batch:
-                _, qids = batch_results.get(title, (False, []))
-                batch_qids.update(qids)
-
-            labels = resolve_labels(list(batch_qids), language) if batch_qids else {}
-
-            for file_title in batch:
+        try:
+            for future in as_completed(future_map):
+                batch = future_map[future]
+                checked = True
                 try:
+                    batch_results, labels = future.result()
+                except Exception as e:
+                    print(f"Error processing batch: {e}", file=sys.stderr)
+                    batch_results, labels = {title: (False, []) for title in batch}, {}
+                    checked = False
+
+                rows = []
+                for file_title in batch:
                     has_depicts, qids = batch_results.get(file_title, (False, []))
                     depicts_str = None
                     if qids:
                         label_list = [labels.get(qid, qid) for qid in qids]
                         depicts_str = ", ".join(label_list)
-
-                    insert_file(file_title, category_name, depicts_str, has_depicts)
+                    # Rows from a failed check, or showing bare QIDs because the
+                    # label lookup failed, are stored without a revision so the
+                    # next analysis re-checks them instead of reusing them
+                    complete = checked and all(qid in labels for qid in qids)
+                    rows.append((file_title, category_name, depicts_str, has_depicts,
+                                 revisions.get(file_title) if complete else None, language))
+
+                # One transaction per batch instead of one commit per file
+                try:
+                    insert_files_bulk(rows, checked=checked)
                 except Exception as e:
-                    print(f"Error processing {file_title}: {e}", file=sys.stderr)
-                    insert_file(file_title, category_name, None, False)
-
-                processed += 1
-                if progress_callback:
-                    progress_callback(f"Checking file {processed}/{total}: {file_title}")
+                    print(f"Error saving batch: {e}", file=sys.stderr)
+
+                for file_title in batch:
+                    processed += 1
+                    if progress_callback:
+                        progress_callback(f"Checking file {processed}/{total}: {file_title}")
+
+                    if progress_hook:
+                        progress_hook({
+                            "phase": "checking",
+                            "message": "Checking depicts statements",
+                            "processed": processed,
+                            "total": total
+                        })
+        except BaseException:
+            # A cancelled job raises out of progress_hook; drop the queued
+            # batches so the executor only waits for the ones in flight
+            for pending in future_map:
+                pending.cancel()
+            raise
 
-                if progress_hook:
-                    progress_hook({
-                        "phase": "checking",
-                        "message": "Checking depicts statements",
-                        "processed": processed,
-                        "total": total
-                    })
+    try:
+        analyze_files()
+    except Exception as e:
+        print(f"Error refreshing planner statistics: {e}", file=sys.stderr)
 
     # Step 3: Get results
     if progress_hook:
@@ -251,33 +399,171 @@ class _AnalysisCancelled(Exception):
     """Raised when a job is cancelled mid-flight."""
 
 
-analysis_jobs = {}
-analysis_lock = threading.Lock()
-
 # Maximum age (seconds) to keep completed/error/cancelled jobs before pruning
 _JOB_TTL = 300  # 5 minutes
+# Upper bound on how long an unfinished job's state is kept (Redis expiry, and
+# the in-process prune for jobs whose thread died or never started)
+_JOB_RUNNING_TTL = 6 * 3600
+_DONE_STATES = ("done", "error", "cancelled")
+_CANCELLED_FIELDS = {"status": "cancelled", "phase": "cancelled", "message": "Cancelled by user"}
 
 
-def _prune_stale_jobs() -> None:
-    """Remove completed/error/cancelled jobs older than _JOB_TTL.
-    Must be called while analysis_lock is held."""
-    now = time.time()
-    stale = [
-        jid for jid, job in analysis_jobs.items()
-        if job.get("status") in ("done", "error", "cancelled")
-        and now - job.get("updated_at", 0) > _JOB_TTL
-    ]
-    for jid in stale:
-        del analysis_jobs[jid]
+class _LocalJobStore:
+    """
+    Process-local job table; fine for a single worker or development.
+
+    Job dicts are copy-on-write: writers build a new dict and publish it
+    with one assignment, so progress polls read a consistent snapshot
+    without taking the lock. Only writers serialize, which keeps
+    read-modify-write updates and the cancel check-and-set atomic.
+    Every write notifies _changed so progress streams wake up.
+    """
+
+    def __init__(self) -> None:
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _prune(self) -> None:
+        """
+        Remove finished jobs older than _JOB_TTL and unfinished ones not
+        updated for _JOB_RUNNING_TTL, matching the Redis expiries. Caller
+        holds the lock.
+        """
+        now = time.time()
+        stale = [
+            jid for jid, job in self._jobs.items()
+            if now - job.get("updated_at", 0)
+            > (_JOB_TTL if job.get("status") in _DONE_STATES else _JOB_RUNNING_TTL)
+        ]
+        for jid in stale:
+            del self._jobs[jid]
+
+    def update(self, job_id: str, updates: dict) -> None:
+        with self._lock:
+            self._prune()
+            job = dict(self._jobs.get(job_id, ()))
+            job.update(updates)
+            job["updated_at"] = time.time()
+            self._jobs[job_id] = job
+            self._changed.notify_all()
+
+    def get(self, job_id: str):
+        """Return the job's current snapshot (treat it as read-only)."""
+        return self._jobs.get(job_id)
+
+    def watch(self, job_id: str, timeout: float):
+        """
+        Yield the job's snapshot now and after every change, or None when
+        nothing changed within `timeout` seconds. Stops once the job is gone.
+        """
+        seen = None
+        while True:
+            with self._changed:
+                self._changed.wait_for(lambda: self._jobs.get(job_id) is not seen, timeout)
+                job = self._jobs.get(job_id)
+            if job is None:
+                return
+            if job is seen:
+                yield None
+                continue
+            seen = job
+            yield job
+
+    def cancel(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.get("status") in _DONE_STATES:
+                return False
+            self._jobs[job_id] = {**job, **_CANCELLED_FIELDS, "updated_at": time.time()}
+            self._changed.notify_all()
+            return True
+
+
+class _RedisJobStore:
+    """
+    Job table shared by all gunicorn workers: one hash per job, with
+    JSON-encoded field values, that expires once the job is finished.
+    Writes are also announced on a pub/sub channel named after the hash.
+    """
+
+    _PREFIX = "cda:job:"
+
+    # Check-and-set so a job that already finished is never marked cancelled
+    _CANCEL_SCRIPT = """
+        local status = redis.call('HGET', KEYS[1], 'status')
+        if not status then return 0 end
+        local s = cjson.decode(status)
+        if s == 'done' or s == 'error' or s == 'cancelled' then return 0 end
+        redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+        redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+        redis.call('PUBLISH', KEYS[1], 'cancelled')
+        return 1
+    """
+
+    def __init__(self, url: str) -> None:
+        self._redis = redis.from_url(url, decode_responses=True)
+        self._cancel = self._redis.register_script(self._CANCEL_SCRIPT)
+
+    def update(self, job_id: str, updates: dict) -> None:
+        key = self._PREFIX + job_id
+        fields = {k: json.dumps(v) for k, v in updates.items()}
+        fields["updated_at"] = json.dumps(time.time())
+        ttl = _JOB_TTL if updates.get("status") in _DONE_STATES else _JOB_RUNNING_TTL
+        pipe = self._redis.pipeline()
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, ttl)
+        pipe.publish(key, "updated")
+        pipe.execute()
+
+    def get(self, job_id: str):
+        raw = self._redis.hgetall(self._PREFIX + job_id)
+        return {k: json.loads(v) for k, v in raw.items()} if raw else None
+
+    def watch(self, job_id: str, timeout: float):
+        """Same contract as _LocalJobStore.watch, driven by pub/sub messages."""
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._PREFIX + job_id)
+        try:
+            # Read after subscribing so no update can slip in between
+            job = self.get(job_id)
+            while job is not None:
+                yield job
+                while not pubsub.get_message(timeout=timeout):
+                    yield None
+                job = self.get(job_id)
+        finally:
+            pubsub.close()
+
+    def cancel(self, job_id: str) -> bool:
+        args = [_JOB_TTL]
+        for k, v in _CANCELLED_FIELDS.items():
+            args += [k, json.dumps(v)]
+        args += ["updated_at", json.dumps(time.time())]
+        return bool(self._cancel(keys=[self._PREFIX + job_id], args=args))
+
+
+if _USE_REDIS:
+    job_store = _RedisJobStore(REDIS_URL)
+else:
+    if REDIS_URL:
+        print("WARNING: REDIS_URL is set but the redis package is not installed; "
+              "sessions, rate limits and job progress are kept per worker.", file=sys.stderr)
+    job_store = _LocalJobStore()
+
+# Durable job queue: jobs outlive web worker restarts and run on however many
+# `rq worker` processes are started. Without it each job gets a daemon thread.
+if _USE_REDIS and RQ_QUEUE and rq is not None:
+    _job_queue = rq.Queue(RQ_QUEUE, connection=redis.from_url(REDIS_URL))
+else:
+    if RQ_QUEUE:
+        print("WARNING: RQ_QUEUE needs REDIS_URL and the rq package; "
+              "analysis jobs run in web worker threads.", file=sys.stderr)
+    _job_queue = None
 
 
 def _set_job(job_id: str, **updates) -> None:
-    with analysis_lock:
-        _prune_stale_jobs()
-        job = analysis_jobs.get(job_id, {})
-        job.update(updates)
-        job["updated_at"] = time.time()
-        analysis_jobs[job_id] = job
+    job_store.update(job_id, updates)
 
 
 def _compute_percent(job: dict) -> int:
@@ -295,37 +581,70 @@ def _compute_percent(job: dict) -> int:
 
 
 def is_job_cancelled(job_id: str) -> bool:
-    with analysis_lock:
-        job = analysis_jobs.get(job_id, {})
-        return job.get("status") == "cancelled"
+    job = job_store.get(job_id) or {}
+    return job.get("status") == "cancelled"
 
 
 def cancel_job(job_id: str) -> bool:
-    with analysis_lock:
-        job = analysis_jobs.get(job_id)
-        if not job:
-            return False
-        if job.get("status") in ("done", "error", "cancelled"):
-            return False
-        job["status"] = "cancelled"
-        job["phase"] = "cancelled"
-        job["message"] = "Cancelled by user"
-        job["updated_at"] = time.time()
-        return True
+    return job_store.cancel(job_id)
+
+
+# Minimum seconds between progress writes for one job (phase changes and the
+# final file are always written)
+_PROGRESS_INTERVAL = 0.25
+
+# Analyses running at once in this process (background jobs and synchronous
+# /api/analyze calls); further ones wait for a slot instead of piling more
+# concurrent fan-out onto the Wikimedia APIs.
+_analysis_slots = threading.BoundedSemaphore(MAX_CONCURRENT_ANALYSES)
+# How long a synchronous /api/analyze call waits for a slot before it gets a
+# 503; background jobs wait as long as it takes
+_ANALYSIS_SLOT_WAIT = 5  # seconds
 
 
 def _run_analysis_job(job_id: str, category: str, language: str = "en") -> None:
+    # A queued job may have been cancelled before a worker picked it up
+    if is_job_cancelled(job_id):
+        return
+
+    if not _analysis_slots.acquire(blocking=False):
+        _set_job(job_id, message="Waiting for a free analysis slot")
+        _analysis_slots.acquire()
+    try:
+        _analyze_job(job_id, category, language)
+    finally:
+        _analysis_slots.release()
+
+
+def _analyze_job(job_id: str, category: str, language: str) -> None:
+    last = {"at": 0.0, "phase": None}
+
     def hook(info: dict) -> None:
+        now = time.time()
+        phase = info.get("phase")
+        if (phase == last["phase"] and info.get("processed") != info.get("total")
+                and now - last["at"] < _PROGRESS_INTERVAL):
+            return
+        last["at"] = now
+        last["phase"] = phase
         if is_job_cancelled(job_id):
             raise _AnalysisCancelled()
         _set_job(job_id, **info)
 
+    # Cancelled while waiting for a slot
+    if is_job_cancelled(job_id):
+        return
+
     _set_job(job_id, status="running", phase="fetching", message="Starting analysis")
 
     try:
         result = analyze_category(category, progress_hook=hook, language=language)
     except _AnalysisCancelled:
         return
+    except Exception:
+        # Without this the job would report "running" until it is pruned
+        logger.exception("Analysis job %s failed", job_id)
+        result = {"error": "Analysis failed unexpectedly"}
 
     if is_job_cancelled(job_id):
         return
@@ -338,9 +657,8 @@ def _run_analysis_job(job_id: str, category: str, language: str = "en") -> None:
 
 
 def job_total(job_id: str) -> int:
-    with analysis_lock:
-        job = analysis_jobs.get(job_id, {})
-        return int(job.get("total") or 0)
+    job = job_store.get(job_id) or {}
+    return int(job.get("total") or 0)
 
 
 def start_analysis_job(category: str, language: str = "en") -> str:
@@ -356,11 +674,46 @@ def start_analysis_job(category: str, language: str = "en") -> str:
         message="Queued"
     )
 
+    if _job_queue is not None:
+        # By dotted path, so workers resolve it even when the app runs as __main__
+        _job_queue.enqueue("main._run_analysis_job", job_id, category, language,
+                           job_id=job_id, job_timeout="1h")
+        return job_id
+
     thread = threading.Thread(target=_run_analysis_job, args=(job_id, category, language), daemon=True)
     thread.start()
     return job_id
 
 
+def _category_arg(raw: str) -> str:
+    """
+    Validate a category taken from the URL and return its prefixed title.
+
+    Raises ValueError (reported as 400) so bad input never reaches SQL or
+    the Commons API.
+    """
+    return normalize_category(validate_category(raw))
+
+
+def _not_modified(etag: str):
+    """Return a bodiless 304 if the client already holds this revision."""
+    # Compressed responses carry the tag as "<etag>:<algorithm>"
+    if request.if_none_match.contains(etag) or any(
+            tag.startswith(etag + ":") for tag in request.if_none_match):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+    return None
+
+
+def _with_etag(response, etag: str):
+    """Tag a response so browsers revalidate it instead of refetching it."""
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
 # ============ API Endpoints ============
 
 @app.route("/")
@@ -415,7 +768,15 @@ def api_analyze():
         job_id = start_analysis_job(category, language)
         return jsonify({"job_id": job_id, "status": "started"}), 202
 
-    result = analyze_category(category, language=language)
+    # Each slot may be held for minutes; don't tie up a request thread for that
+    if not _analysis_slots.acquire(timeout=_ANALYSIS_SLOT_WAIT):
+        response = jsonify({"error": "Too many analyses are running, please try again shortly"})
+        response.headers["Retry-After"] = str(_ANALYSIS_SLOT_WAIT)
+        return response, 503
+    try:
+        result = analyze_category(category, language=language)
+    finally:
+        _analysis_slots.release()
 
     if "error" in result:
         return jsonify(result), 400
@@ -428,40 +789,67 @@ def api_results(category):
     """
     Get stored results for a category.
 
-    Returns cached analysis results from database.
+    Returns cached analysis results from database. With ?limit=N the files
+    are paged: pass the returned "next" cursor back as after_has_depicts and
+    after_file to get the following page.
     """
-    # Normalize category name
-    if not category.startswith("Category:"):
-        category = f"Category:{category}"
-
-    stats = get_statistics(category)
+    try:
+        category = _category_arg(category)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
-    if stats["total"] == 0:
+    revision = get_category_revision(category)
+    if revision is None:
         return jsonify({"error": "No results found for this category"}), 404
+    not_modified = _not_modified(revision)
+    if not_modified:
+        return not_modified
 
-    files_data = get_files_by_category(category)
+    stats = get_statistics(category)
 
-    return jsonify({
+    limit = request.args.get("limit", type=int)
+    if not limit or limit <= 0:
+        # Unpaged: the same document, streamed a few hundred rows at a time
+        # from the cursor, so big categories are never held as one list
+        # plus one serialized string
+        def generate_results():
+            dumps = app.json.dumps
+            yield f'{{"category":{dumps(category)},"statistics":{dumps(stats)},"files":['
+            sep = ""
+            chunk = []
+            for file_name, depicts, has_depicts in iter_files_by_category(category):
+                chunk.append({"file_name": file_name, "depicts": depicts, "has_depicts": has_depicts})
+                if len(chunk) == 500:
+                    yield sep + dumps(chunk)[1:-1]
+                    sep = ","
+                    chunk = []
+            if chunk:
+                yield sep + dumps(chunk)[1:-1]
+            yield "]}\n"
+
+        return _with_etag(Response(generate_results(), mimetype="application/json"), revision)
+
+    limit = min(limit, 5000)
+    after = None
+    after_file = request.args.get("after_file")
+    if after_file is not None:
+        after = (request.args.get("after_has_depicts", 0, type=int), after_file)
+    files_data = get_files_by_category_page(category, after, limit)
+    next_cursor = None
+    if len(files_data) == limit:
+        last = files_data[-1]
+        next_cursor = {"has_depicts": last["has_depicts"], "file_name": last["file_name"]}
+
+    return _with_etag(jsonify({
         "category": category,
         "statistics": stats,
-        "files": files_data
-    })
-
-
-@app.route("/api/progress/<job_id>", methods=["GET"])
-def api_progress(job_id):
-    """
-    Get progress for a background analysis job.
+        "files": files_data,
+        "next": next_cursor
+    }), revision)
 
-    Returns status, phase, processed/total, and percent.
-    """
-    with analysis_lock:
-        job = analysis_jobs.get(job_id)
 
-    if not job:
-        return jsonify({"error": "Job not found"}), 404
-
-    payload = {
+def _progress_payload(job_id: str, job: dict) -> dict:
+    return {
         "job_id": job_id,
         "status": job.get("status"),
         "phase": job.get("phase"),
@@ -473,7 +861,47 @@ def api_progress(job_id):
         "percent": _compute_percent(job)
     }
 
-    return jsonify(payload)
+
+# Seconds between SSE keep-alive comments while a job is quiet
+_STREAM_KEEPALIVE = 15
+
+
+@app.route("/api/progress/<job_id>", methods=["GET"])
+def api_progress(job_id):
+    """
+    Get progress for a background analysis job.
+
+    Returns status, phase, processed/total, and percent.
+    """
+    job = job_store.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify(_progress_payload(job_id, job))
+
+
+@app.route("/api/progress/<job_id>/stream", methods=["GET"])
+def api_progress_stream(job_id):
+    """
+    Stream progress for a background analysis job as Server-Sent Events.
+
+    Sends the api_progress payload on every change and closes the stream
+    once the job is done, failed or cancelled.
+    """
+    if not job_store.get(job_id):
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        for job in job_store.watch(job_id, _STREAM_KEEPALIVE):
+            if job is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"data: {app.json.dumps(_progress_payload(job_id, job))}\n\n"
+            if job.get("status") in _DONE_STATES:
+                return
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @app.route("/api/cancel/<job_id>", methods=["POST"])
@@ -511,12 +939,23 @@ def api_verify(category):
 
     Returns verification info including record counts, timestamps, and sample data.
     """
+    try:
+        category = _category_arg(category)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+
+    revision = get_category_revision(category)
+    if revision is not None:
+        not_modified = _not_modified(revision)
+        if not_modified:
+            return not_modified
+
     result = verify_category_saved(category)
 
     if not result.get("verified"):
         return jsonify(result), 404
 
-    return jsonify(result)
+    return _with_etag(jsonify(result), revision)
 
 
 @app.route("/api/history", methods=["GET"])
@@ -527,10 +966,17 @@ def api_history():
     Returns category names, file counts, and last analyzed timestamps.
     """
     categories = get_all_categories()
-    return jsonify({
+    response = jsonify({
         "categories": categories,
         "total": len(categories)
     })
+    # The listing is cheap to build; the ETag (body hash) saves the transfer
+    response.add_etag()
+    not_modified = _not_modified(response.get_etag()[0])
+    if not_modified:
+        return not_modified
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.route("/api/category/<path:category>", methods=["DELETE"])
@@ -543,9 +989,10 @@ def api_delete_category(category):
     Args:
         category: Category name to delete
     """
-    # Normalize category name
-    if not category.startswith("Category:"):
-        category = f"Category:{category}"
+    try:
+        category = _category_arg(category)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
     # Check if category exists
     stats = get_statistics(category)
@@ -569,20 +1016,23 @@ def api_export(category):
 
     Query params: ?format=csv|json (default: csv)
     """
-    from flask import Response
     import csv
     from io import StringIO
 
-    # Normalize category name
-    if not category.startswith("Category:"):
-        category = f"Category:{category}"
+    try:
+        category = _category_arg(category)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
 
     # Get data
-    stats = get_statistics(category)
-    if stats["total"] == 0:
+    revision = get_category_revision(category)
+    if revision is None:
         return jsonify({"error": "No results found for this category"}), 404
+    not_modified = _not_modified(revision)
+    if not_modified:
+        return not_modified
+    stats = get_statistics(category)
 
-    files_data = get_files_by_category(category)
     export_format = request.args.get("format", "csv").lower()
 
     if export_format == "json":
@@ -590,11 +1040,11 @@ def api_export(category):
         result = {
             "category": category,
             "statistics": stats,
-            "files": files_data,
+            "files": get_files_by_category(category),
             "exported_at": time.strftime("%Y-%m-%d %H:%M:%S UTC", time.gmtime())
         }
         response = Response(
-            json.dumps(result, indent=2),
+            app.json.dumps(result, indent=2, sort_keys=False),
             mimetype="application/json",
             headers={
                 "Content-Disposition": (
@@ -604,29 +1054,36 @@ def api_export(category):
                 )
             }
         )
-        return response
+        return _with_etag(response, revision)
 
     else:
-        # CSV export
-        output = StringIO()
-        writer = csv.writer(output)
-
-        # Header
-        writer.writerow(["File Name", "Has Depicts", "Depicts Labels"])
-
-        # Data rows
-        for file in files_data:
-            writer.writerow([
-                file["file_name"],
-                "Yes" if file["has_depicts"] else "No",
-                file.get("depicts", "")
-            ])
-
-        csv_data = output.getvalue()
-        output.close()
+        # CSV export, streamed: rows go from the cursor into a small buffer
+        # that is flushed every few hundred rows, so the full file is never
+        # held in memory
+        def generate_csv():
+            output = StringIO()
+            writer = csv.writer(output)
+
+            # Header
+            writer.writerow(["File Name", "Has Depicts", "Depicts Labels"])
+
+            # Data rows
+            for i, (file_name, depicts, has_depicts) in enumerate(iter_files_by_category(category), 1):
+                writer.writerow([
+                    file_name,
+                    "Yes" if has_depicts else "No",
+                    depicts or ""
+                ])
+                if i % 500 == 0:
+                    yield output.getvalue()
+                    output.seek(0)
+                    output.truncate()
+
+            yield output.getvalue()
+            output.close()
 
         response = Response(
-            csv_data,
+            generate_csv(),
             mimetype="text/csv",
             headers={
                 "Content-Disposition": (
@@ -636,7 +1093,7 @@ def api_export(category):
                 )
             }
         )
-        return response
+        return _with_etag(response, revision)
 
 
 @app.route("/api/fileinfo/<path:file_title>", methods=["GET"])
@@ -735,16 +1192,9 @@ def auth_callback():
     # Clear old session data, start fresh
     session.clear()
 
-    access_token = token_data.get("access_token")
-    session["access_token"] = access_token
-
-    # Track token expiry
-    expires_in = token_data.get("expires_in")
-    if expires_in:
-        session["token_expires_at"] = time.time() + int(expires_in)
-    else:
-        # Default: 1 hour expiry
-        session["token_expires_at"] = time.time() + 3600
+    # Access/refresh tokens and expiry
+    store_session_tokens(token_data)
+    access_token = session["access_token"]
 
     # Get user profile
     profile_success, profile = get_user_profile(access_token)
@@ -778,12 +1228,9 @@ def auth_status():
     """Check current auth status."""
     logged_in = "access_token" in session
 
-    # Auto-expire if token is past its lifetime
+    # Refresh an expiring token; auto-expire if that is impossible
     if logged_in:
-        token_expiry = session.get("token_expires_at")
-        if token_expiry and time.time() > token_expiry:
-            session.clear()
-            logged_in = False
+        logged_in = ensure_fresh_token()
 
     response_data = {
         "logged_in": logged_in,
@@ -793,7 +1240,8 @@ def auth_status():
 
     # Include CSRF token for authenticated users (needed for write operations)
     if logged_in:
-        response_data["csrf_token"] = session.get("_csrf_token", generate_csrf_token())
+        # Reuse the stored token; minting one per call rewrote the session every time
+        response_data["csrf_token"] = session.get("_csrf_token") or generate_csrf_token()
 
     return jsonify(response_data)
 
@@ -827,11 +1275,73 @@ def api_add_depicts():
 
     if success:
         logger.info(f"Depicts {qid} added to {file_title} by {session.get('username')}")
+        # Stored rows for this file are now out of date; re-check on next analysis
+        try:
+            mark_file_stale(file_title)
+        except Exception:
+            logger.exception("Failed to mark file stale after depicts edit")
         return jsonify({"success": True, "message": message})
     else:
         return jsonify({"success": False, "error": message}), 500
 
 
+# Edits accepted per /api/add-depicts-batch request
+MAX_BATCH_EDITS = 50
+
+
+def _batch_edit_cost() -> int:
+    """Charge the write rate limit per edit, not per request."""
+    data = request.get_json(silent=True)
+    edits = data.get("edits") if isinstance(data, dict) else None
+    return min(max(len(edits), 1), MAX_BATCH_EDITS) if isinstance(edits, list) else 1
+
+
+@app.route("/api/add-depicts-batch", methods=["POST"])
+@limiter.limit(RATE_LIMIT_API_WRITE, cost=_batch_edit_cost)
+@login_required
+@csrf_required
+def api_add_depicts_batch():
+    """
+    Add several depicts (P180) statements in one request.
+
+    Body: {"edits": [{"file_title": ..., "qid": ...}, ...]}, at most
+    MAX_BATCH_EDITS entries. Claims for the same file are written in a
+    single Commons edit. Responds with one result per edit, in order.
+    """
+    data = request.get_json()
+    edits = data.get("edits") if isinstance(data, dict) else None
+    if not isinstance(edits, list) or not edits:
+        return jsonify({"error": "Request body must contain a non-empty 'edits' list"}), 400
+    if len(edits) > MAX_BATCH_EDITS:
+        return jsonify({"error": f"At most {MAX_BATCH_EDITS} edits per request"}), 400
+
+    try:
+        pairs = [
+            (validate_file_title(e.get("file_title", "")), validate_qid(e.get("qid", "")))
+            for e in edits if isinstance(e, dict)
+        ]
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    if len(pairs) != len(edits):
+        return jsonify({"error": "Each edit must be an object with file_title and qid"}), 400
+
+    results = add_depicts_statements_batch(session["access_token"], pairs)
+
+    for file_title in {title for title, success, _ in results if success}:
+        try:
+            mark_file_stale(file_title)
+        except Exception:
+            logger.exception("Failed to mark file stale after depicts edit")
+
+    return jsonify({
+        "results": [
+            {"file_title": title, "qid": qid, "success": success, "message": message}
+            for (title, success, message), (_, qid) in zip(results, pairs)
+        ],
+        "succeeded": sum(1 for _, success, _ in results if success),
+    })
+
+
 # ============ CLI Mode ============
 
 def cli_main():
@@ -864,7 +1374,7 @@ def cli_main():
         sys.exit(1)
 
     if args.json:
-        print(json.dumps(result, indent=2))
+        print(app.json.dumps(result, indent=2, sort_keys=False))
     else:
         stats = result["statistics"]
         print(f"\n{'='*50}", file=sys.stderr)
@@ -879,9 +1389,8 @@ def cli_main():
             print(f"  Coverage:         {coverage:.1f}%", file=sys.stderr)
 
         print("\n[FILES] Without depicts:", file=sys.stderr)
-        for f in result["files"]:
-            if not f["has_depicts"]:
-                print(f"    - {f['file_name']}", file=sys.stderr)
+        for file_name in get_files_without_depicts(result["category"]):
+            print(f"    - {file_name}", file=sys.stderr)
 
 
 if __name__ == "__main__":
@@ -892,4 +1401,7 @@ if __name__ == "__main__":
         # Start web server
         print("Starting Wikimedia Commons Depicts Analyzer...")
         print("Open http://localhost:5000 in your browser")
+        if IS_PRODUCTION:
+            print("WARNING: this is the development server; run under gunicorn in production "
+                  "(see the Procfile and gunicorn.conf.py).", file=sys.stderr)
         app.run(host=HOST, port=PORT, debug=DEBUG)
@@ -13,8 +13,13 @@ import logging
 import re
 import secrets
 import hmac
+import hashlib
+import threading
+import time
 from functools import wraps
-from flask import request, jsonify, session, abort
+from typing import Any, Dict, Optional, Tuple
+from flask import current_app, request, jsonify, session, abort
+from oauth import refresh_access_token
 
 # ============ Logging ============
 # Configure secure logging — never log tokens or secrets
@@ -28,14 +33,15 @@ logger = logging.getLogger("security")
 
 # ============ Input Validation ============
 
-# Strict patterns — whitelist approach
-QID_PATTERN = re.compile(r"^Q\d{1,10}$")
+# Strict patterns — whitelist approach, applied with fullmatch() (no anchors;
+# unlike "$", fullmatch also rejects a trailing newline)
+QID_PATTERN = re.compile(r"Q\d{1,10}")
 FILE_TITLE_PATTERN = re.compile(
-    r"^[A-Za-z0-9 _\-.,;:()\[\]\u00C0-\u024F\u0400-\u04FF\u4E00-\u9FFF]+\.[a-zA-Z]{2,5}$"
+    r"[A-Za-z0-9 _\-.,;:()\[\]\u00C0-\u024F\u0400-\u04FF\u4E00-\u9FFF]+\.[a-zA-Z]{2,5}"
 )
 MAX_FILE_TITLE_LENGTH = 255
 MAX_CATEGORY_LENGTH = 255
-CATEGORY_PATTERN = re.compile(r"^[A-Za-z0-9 _\-.,;:()\[\]\u00C0-\u024F\u0400-\u04FF\u4E00-\u9FFF]+$")
+CATEGORY_PATTERN = re.compile(r"[A-Za-z0-9 _\-.,;:()\[\]\u00C0-\u024F\u0400-\u04FF\u4E00-\u9FFF]+")
 
 
 def validate_qid(qid: str) -> str:
@@ -50,7 +56,7 @@ def validate_qid(qid: str) -> str:
 
     qid = qid.strip().upper()
 
-    if not QID_PATTERN.match(qid):
+    if not QID_PATTERN.fullmatch(qid):
         raise ValueError("Invalid QID format: must match Q followed by 1-10 digits")
 
     return qid
@@ -79,7 +85,7 @@ def validate_file_title(title: str) -> str:
     if not clean_title:
         raise ValueError("File title cannot be empty")
 
-    if not FILE_TITLE_PATTERN.match(clean_title):
+    if not FILE_TITLE_PATTERN.fullmatch(clean_title):
         raise ValueError("File title contains invalid characters")
 
     # Block path traversal attempts
@@ -113,7 +119,7 @@ def validate_category(category: str) -> str:
     if not clean_cat:
         raise ValueError("Category name cannot be empty")
 
-    if not CATEGORY_PATTERN.match(clean_cat):
+    if not CATEGORY_PATTERN.fullmatch(clean_cat):
         raise ValueError("Category name contains invalid characters")
 
     if ".." in category or "\\" in category:
@@ -189,17 +195,28 @@ SECURITY_HEADERS = {
 }
 
 
+# Built once: applied to every response, the second pair to authenticated ones
+_SECURITY_HEADER_ITEMS = tuple(SECURITY_HEADERS.items())
+_NO_STORE_HEADER_ITEMS = (
+    ("Cache-Control", "no-store, no-cache, must-revalidate, private"),
+    ("Pragma", "no-cache"),
+)
+
+# Endpoints that only serve files from the frontend folder (see main.py).
+# Their bodies hold nothing user-specific, so the session is not loaded for
+# them; with server-side sessions that saves a store read per asset.
+FRONTEND_ENDPOINTS = frozenset({"static", "serve_index", "deep_link_category", "serve_static"})
+
+
 def add_security_headers(response):
     """
     Flask after_request handler to inject security headers on every response.
     """
-    for header, value in SECURITY_HEADERS.items():
-        response.headers[header] = value
+    response.headers.update(_SECURITY_HEADER_ITEMS)
 
     # Cache control for authenticated responses
-    if "access_token" in session:
-        response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, private"
-        response.headers["Pragma"] = "no-cache"
+    if request.endpoint not in FRONTEND_ENDPOINTS and "access_token" in session:
+        response.headers.update(_NO_STORE_HEADER_ITEMS)
 
     return response
 
@@ -221,6 +238,99 @@ def sanitize_error(exception: Exception, context: str = "operation") -> dict:
     }
 
 
+# ============ Access Token Lifetime ============
+
+# Refresh this long before expiry so a token does not lapse mid-request
+TOKEN_REFRESH_MARGIN = 60  # seconds
+DEFAULT_TOKEN_LIFETIME = 3600  # seconds, when the token response omits expires_in
+# How long a redeemed refresh token's outcome is remembered for concurrent
+# requests that were still holding it
+ROTATED_TOKEN_TTL = 60  # seconds
+
+# Wikimedia rotates the refresh token on every use, so two requests refreshing
+# the same session at once would leave one of them with a revoked token. One
+# lock per refresh token (keyed by its digest) lets the first request redeem it
+# while the others wait and reuse its result from _rotated_tokens.
+_refresh_guard = threading.Lock()
+_refresh_locks: Dict[str, threading.Lock] = {}
+_rotated_tokens: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+
+
+def store_session_tokens(token_data: Dict[str, Any]) -> None:
+    """Save an OAuth token response (access/refresh token, expiry) in the session."""
+    session["access_token"] = token_data["access_token"]
+    # Wikimedia rotates refresh tokens; keep the old one if none was returned
+    if token_data.get("refresh_token"):
+        session["refresh_token"] = token_data["refresh_token"]
+    expires_in = token_data.get("expires_in") or DEFAULT_TOKEN_LIFETIME
+    session["token_expires_at"] = time.time() + int(expires_in)
+
+
+def _refresh_lock(key: str) -> threading.Lock:
+    """Return the lock for one refresh token, pruning outcomes past their TTL."""
+    with _refresh_guard:
+        now = time.time()
+        for old in [k for k, (at, _) in _rotated_tokens.items() if now - at > ROTATED_TOKEN_TTL]:
+            del _rotated_tokens[old]
+            _refresh_locks.pop(old, None)
+        return _refresh_locks.setdefault(key, threading.Lock())
+
+
+def _redeem_refresh_token(refresh_token: str) -> Optional[Dict[str, Any]]:
+    """Exchange a refresh token once per process; concurrent callers share the result."""
+    key = hashlib.sha256(refresh_token.encode()).hexdigest()
+    with _refresh_lock(key):
+        if key in _rotated_tokens:
+            return _rotated_tokens[key][1]
+        success, token_data = refresh_access_token(refresh_token)
+        _rotated_tokens[key] = (time.time(), token_data if success else None)
+        return token_data if success else None
+
+
+def _adopt_stored_tokens(refresh_token: str) -> bool:
+    """
+    Take over tokens another worker already saved for this session.
+
+    The request's session is a snapshot from when it started; re-read it from
+    the server-side store and, if the refresh token there has moved on, copy
+    the newer tokens instead of treating the failed refresh as fatal.
+    """
+    app = current_app._get_current_object()
+    stored = app.session_interface.open_session(app, request) or {}
+    if stored.get("refresh_token") in (None, refresh_token) or "access_token" not in stored:
+        return False
+    for key in ("access_token", "refresh_token", "token_expires_at"):
+        session[key] = stored.get(key)
+    return True
+
+
+def ensure_fresh_token() -> bool:
+    """
+    Refresh the session's access token when it is about to expire.
+
+    Returns False, after clearing the session, only if the token has expired
+    and could not be refreshed.
+    """
+    token_expiry = session.get("token_expires_at")
+    if not token_expiry or time.time() < token_expiry - TOKEN_REFRESH_MARGIN:
+        return True
+
+    refresh_token = session.get("refresh_token")
+    if refresh_token:
+        token_data = _redeem_refresh_token(refresh_token)
+        if token_data:
+            store_session_tokens(token_data)
+            return True
+        if _adopt_stored_tokens(refresh_token):
+            return True
+        logger.warning("Access token refresh failed")
+
+    if time.time() > token_expiry:
+        session.clear()
+        return False
+    return True
+
+
 # ============ Authentication Guard ============
 
 def login_required(f):
@@ -233,17 +343,12 @@ def login_required(f):
                 "status": "unauthorized"
             }), 401
 
-        # Check if token has expired
-        token_expiry = session.get("token_expires_at")
-        if token_expiry:
-            import time
-            if time.time() > token_expiry:
-                # Clear expired session
-                session.clear()
-                return jsonify({
-                    "error": "Session expired. Please log in again.",
-                    "status": "session_expired"
-                }), 401
+        # Refresh an expiring token; clear the session if that is impossible
+        if not ensure_fresh_token():
+            return jsonify({
+                "error": "Session expired. Please log in again.",
+                "status": "session_expired"
+            }), 401
 
         return f(*args, **kwargs)
     return decorated
@@ -659,9 +659,45 @@ function updateProgressFromStatus(status) {
     showProgress(status.percent || 0, label, detail);
 }
 
+/**
+ * Follow job progress over Server-Sent Events until the job finishes
+ * @param {string} jobId - Job ID
+ * @returns {Promise<Object|null>} Final status, or null if the stream failed
+ */
+function streamProgress(jobId) {
+    return new Promise((resolve) => {
+        const source = new EventSource(`/api/progress/${encodeURIComponent(jobId)}/stream`);
+
+        source.onmessage = (event) => {
+            // Cancelled or superseded: stop without touching the progress UI
+            if (jobId !== activeJobId) {
+                source.close();
+                resolve(null);
+                return;
+            }
+
+            const status = JSON.parse(event.data);
+            updateProgressFromStatus(status);
+
+            if (['done', 'error', 'cancelled'].includes(status.status)) {
+                source.close();
+                resolve(status);
+            }
+        };
+
+        source.onerror = () => {
+            source.close();
+            resolve(null);
+        };
+    });
+}
+
 async function pollProgress(jobId, category) {
+    // Prefer the push stream; fall back to polling if it is unavailable
+    const streamed = window.EventSource ? await streamProgress(jobId) : null;
+
     while (jobId === activeJobId) {
-        const status = await fetchProgress(jobId);
+        const status = streamed || await fetchProgress(jobId);
         updateProgressFromStatus(status);
 
         if (status.status === 'done') {
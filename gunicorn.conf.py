@@ -0,0 +1,32 @@
+"""
+Gunicorn settings for the Procfile `web` process (read from the project root).
+
+Requests spend most of their time waiting on the Wikimedia APIs, so each
+worker serves many of them concurrently on threads. Job progress, sessions
+and rate limits are only shared between workers through Redis, so without
+REDIS_URL a single worker process is used.
+"""
+
+import multiprocessing
+import os
+import threading
+
+# gthread fits the thread pools and locks the app already uses; set
+# GUNICORN_WORKER_CLASS=gevent (with gevent installed) for greenlets instead.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+worker_connections = 1000  # gevent only
+
+_default_workers = multiprocessing.cpu_count() * 2 + 1 if os.environ.get("REDIS_URL") else 1
+workers = int(os.environ.get("WEB_CONCURRENCY", _default_workers))
+
+# Long analyses run in background jobs; this only bounds a stuck worker
+timeout = 120
+graceful_timeout = 30
+
+
+def post_worker_init(worker):
+    # Connect to the Wikimedia hosts in the background so the first OAuth
+    # call in a fresh worker does not pay the DNS + TLS setup
+    import oauth
+    threading.Thread(target=oauth.warm_up, name="http-warm-up", daemon=True).start()